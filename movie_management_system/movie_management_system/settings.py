@@ -49,6 +49,8 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'movieflex.venues.VenueMiddleware',
+    'movieflex.loaders.RequestLoaderMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -136,10 +138,46 @@ connect(
     host='mongodb://localhost:27017'
 )
 
+# Cinemas: venue -> MongoEngine connection alias holding its movies, screenings and bookings.
+# Each venue needs its own alias; aliases other than 'default' are connected from MONGODB_ALIASES.
+# After moving a venue to another alias run `python manage.py rebalance_venues`.
+MOVIEFLEX_VENUES = {'main': 'default'}
+MOVIEFLEX_DEFAULT_VENUE = 'main'
+MONGODB_ALIASES = {}  # e.g. {'north': {'db': 'movie_db_north', 'host': 'mongodb://north-db:27017'}}
+for _alias, _options in MONGODB_ALIASES.items():
+    connect(alias=_alias, **_options)
+
 # Stripe API keys
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', '')
 
+# Movie metadata (titles, posters) is cached this many seconds; 0 disables.
+# Point MOVIE_META_CACHE_ALIAS at a shared cache (Redis/Memcached) in CACHES to share it between workers.
+MOVIE_META_CACHE_TTL = 30
+
+# Admission control for booking_add / booking_payment
+BOOKING_MAX_IN_FLIGHT = int(os.environ.get('BOOKING_MAX_IN_FLIGHT', 50))              # all workers together
+BOOKING_LOCAL_MAX_IN_FLIGHT = int(os.environ.get('BOOKING_LOCAL_MAX_IN_FLIGHT', 10))  # per worker process
+ADMISSION_RATE_PER_SECOND = 5  # waiting-room admissions per second
+ADMISSION_TOKEN_TTL = 600  # seconds a waiting-room admission stays valid
+
+# Password hashing for register/login runs in a bounded thread pool: this many threads (cores),
+# and at most AUTH_HASH_MAX_PENDING hashes queued before logins get a 503. Defaults: half the CPUs, 8 per thread.
+AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', 0)) or None
+AUTH_HASH_MAX_PENDING = int(os.environ.get('AUTH_HASH_MAX_PENDING', 0)) or None
+
+# Signed tickets and door scanners. Scanners need TICKET_SIGNING_KEY to verify QR codes offline,
+# so it must be its own key, never SECRET_KEY; tickets can't be issued or checked until it is set.
+TICKET_SIGNING_KEY = os.environ.get('TICKET_SIGNING_KEY', '')
+SCANNER_API_KEY = os.environ.get('SCANNER_API_KEY', '')  # empty disables the scan API
+
+# Read-only catalogue API (/api/v1/): default page size and seconds clients may cache a page
+CATALOGUE_API_PAGE_SIZE = 50
+CATALOGUE_API_MAX_AGE = 30
+
+# Processes used to render box-office print runs (defaults to the CPU count)
+PRINT_RUN_WORKERS = int(os.environ.get('PRINT_RUN_WORKERS', 0)) or None
+
 # Redirect unauthenticated users to this login URL
 LOGIN_URL = '/login/'
 # Redirect authenticated users to movies list by default
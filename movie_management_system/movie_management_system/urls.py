@@ -20,8 +20,9 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # movieflex first: its admin/bookings/ routes would otherwise be swallowed by the Django admin
     path('', include('movieflex.urls')),
+    path('admin/', admin.site.urls),
 ]
 
 if settings.DEBUG:
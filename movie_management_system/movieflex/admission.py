@@ -0,0 +1,194 @@
+import threading
+import time
+import uuid
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .models import AdmissionState
+
+# Cluster-wide cap on booking requests being processed at once
+BOOKING_MAX_IN_FLIGHT = getattr(settings, 'BOOKING_MAX_IN_FLIGHT', 50)
+# Per-process cap, checked before touching MongoDB
+BOOKING_LOCAL_MAX_IN_FLIGHT = getattr(settings, 'BOOKING_LOCAL_MAX_IN_FLIGHT', 10)
+# A lease left behind by a crashed worker is ignored after this many seconds
+ADMISSION_LEASE_SECONDS = getattr(settings, 'ADMISSION_LEASE_SECONDS', 30)
+# Token bucket refill: waiting-room tickets let in per second (burst up to the cap)
+ADMISSION_RATE_PER_SECOND = getattr(settings, 'ADMISSION_RATE_PER_SECOND', 5)
+# How long a waiting-room admission token stays valid
+ADMISSION_TOKEN_TTL = getattr(settings, 'ADMISSION_TOKEN_TTL', 600)
+
+ADMISSION_COOKIE = 'movieflex_admission'
+ADMISSION_SALT = 'movieflex.admission'
+WAITING_ROOM_REFRESH_SECONDS = 5
+
+
+class Gate:
+    """Concurrency limiter shared by all workers through one AdmissionState document.
+
+    Each admitted request holds a lease in the document's `leases` array; the
+    cap is enforced atomically by only pushing while `leases.<cap-1>` is absent.
+    The waiting room drains through a token bucket refilled at
+    ADMISSION_RATE_PER_SECOND, so it never lets people in faster than that.
+    """
+
+    def __init__(self, name, capacity, local_capacity):
+        self.name = name
+        self.capacity = capacity
+        self._local = threading.BoundedSemaphore(local_capacity)
+        self._snapshot = None
+        self._snapshot_at = 0.0
+
+    def _collection(self):
+        return AdmissionState._get_collection()
+
+    # ---------------- In-flight leases ----------------
+    def _push_lease(self, lease):
+        # Upsert creates the gate document on first use; when the filter fails
+        # because the array is full, the upsert collides with the existing _id.
+        try:
+            self._collection().update_one(
+                {'_id': self.name, f'leases.{self.capacity - 1}': {'$exists': False}},
+                {
+                    '$push': {'leases': {'id': lease, 'exp': time.time() + ADMISSION_LEASE_SECONDS}},
+                    '$setOnInsert': {'next_ticket': 0, 'serving': 0, 'advanced_at': 0},
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def acquire(self):
+        """Return a lease id, or None when the local or shared cap is reached."""
+        if not self._local.acquire(blocking=False):
+            return None
+
+        lease = uuid.uuid4().hex
+        if self._push_lease(lease):
+            return lease
+
+        # At capacity: drop leases abandoned by dead workers and try once more
+        self._collection().update_one({'_id': self.name}, {'$pull': {'leases': {'exp': {'$lt': time.time()}}}})
+        if self._push_lease(lease):
+            return lease
+
+        self._local.release()
+        return None
+
+    def release(self, lease):
+        try:
+            self._collection().update_one({'_id': self.name}, {'$pull': {'leases': {'id': lease}}})
+        finally:
+            self._local.release()
+
+    # ---------------- Waiting room ----------------
+    def state(self, max_age=0):
+        """Gate document; with max_age, a per-process copy up to that many seconds old."""
+        now = time.monotonic()
+        if self._snapshot is None or not max_age or now - self._snapshot_at > max_age:
+            state = self._collection().find_one({'_id': self.name}) or {}
+            self._snapshot = {
+                'leases': state.get('leases', []),
+                'next_ticket': state.get('next_ticket', 0),
+                'serving': state.get('serving', 0),
+                'advanced_at': state.get('advanced_at', 0),
+            }
+            self._snapshot_at = now
+        return self._snapshot
+
+    def queue_is_empty(self):
+        state = self.state(max_age=1)
+        return state['serving'] >= state['next_ticket']
+
+    def take_ticket(self):
+        state = self._collection().find_one_and_update(
+            {'_id': self.name},
+            {'$inc': {'next_ticket': 1}, '$setOnInsert': {'leases': [], 'serving': 0, 'advanced_at': 0}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._snapshot = None
+        return state['next_ticket']
+
+    def advance(self):
+        """Let queued tickets in, bounded by free slots and the token bucket; returns the serving number."""
+        state = self.state()
+        now = time.time()
+        active = sum(1 for lease in state['leases'] if lease['exp'] >= now)
+        tokens = min(self.capacity, (now - state['advanced_at']) * ADMISSION_RATE_PER_SECOND)
+        step = min(self.capacity - active, int(tokens), state['next_ticket'] - state['serving'])
+        if step > 0:
+            # Only one poller wins each step; the others re-read next time
+            self._collection().update_one(
+                {'_id': self.name, 'serving': state['serving']},
+                {'$set': {'serving': state['serving'] + step, 'advanced_at': now}},
+            )
+            return self.state()['serving']
+        return state['serving']
+
+
+booking_gate = Gate('booking', BOOKING_MAX_IN_FLIGHT, BOOKING_LOCAL_MAX_IN_FLIGHT)
+
+
+# ---------------- Admission tokens ----------------
+def issue_admission(request, response, ticket):
+    """Let this user past the gate; the token names them so a copied cookie admits no one else."""
+    token = signing.dumps({'ticket': ticket, 'user': request.user.pk}, salt=ADMISSION_SALT)
+    response.set_cookie(ADMISSION_COOKIE, token, max_age=ADMISSION_TOKEN_TTL, httponly=True, samesite='Lax')
+    return response
+
+
+def has_admission(request):
+    token = request.COOKIES.get(ADMISSION_COOKIE)
+    if not token:
+        return False
+    try:
+        data = signing.loads(token, salt=ADMISSION_SALT, max_age=ADMISSION_TOKEN_TTL)
+    except signing.BadSignature:
+        return False
+    return data.get('user') == request.user.pk
+
+
+def waiting_room_url(next_url):
+    return reverse('waiting_room') + '?' + urlencode({'next': next_url})
+
+
+def render_busy(request, next_url):
+    response = render(request, 'movieflex/waiting_room.html', {
+        'position': None,
+        'next': next_url,
+        'refresh': WAITING_ROOM_REFRESH_SECONDS,
+    }, status=503)
+    response['Retry-After'] = str(WAITING_ROOM_REFRESH_SECONDS)
+    return response
+
+
+# ---------------- View decorator ----------------
+def admission_controlled(view_func):
+    """Cap in-flight booking requests; overflow goes to the FIFO waiting room."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        gate = booking_gate
+        admitted = has_admission(request)
+        # Newcomers queue behind people already waiting
+        if not admitted and not gate.queue_is_empty():
+            return redirect(waiting_room_url(request.get_full_path()))
+
+        lease = gate.acquire()
+        if lease is None:
+            if admitted:
+                return render_busy(request, request.get_full_path())
+            return redirect(waiting_room_url(request.get_full_path()))
+
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            gate.release(lease)
+    return wrapper
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import Binary
+from django.conf import settings
+from django.utils import timezone
+from pymongo import UpdateOne
+
+from .models import Booking, BookingArchive
+from .venues import DEFAULT_VENUE
+
+# Bookings move to the cold tier this long after their screening ended
+ARCHIVE_GRACE_HOURS = getattr(settings, 'ARCHIVE_GRACE_HOURS', 24)
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def _encode(docs):
+    def default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+    lines = '\n'.join(json.dumps(doc, default=default, separators=(',', ':')) for doc in docs)
+    return zlib.compress(lines.encode('utf-8'), 6)
+
+
+def _decode(data):
+    return [json.loads(line) for line in zlib.decompress(data).decode('utf-8').splitlines() if line]
+
+
+def _chunk_id(booking_ids):
+    return hashlib.sha1(','.join(map(str, sorted(booking_ids))).encode()).hexdigest()
+
+
+# ---------------- Moving bookings to the cold tier ----------------
+def archive_finished_bookings(now=None, grace_hours=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move bookings whose screening ended before the cutoff into compressed archive chunks.
+
+    Each batch is written as one chunk per (user, month) and then deleted from
+    the hot collection. Bookings already in a chunk are not written again, and
+    chunk ids are derived from their booking ids, so a run interrupted between
+    the two steps is safe to repeat, even with a later cutoff. Returns bookings moved.
+    """
+    now = now or timezone.now()
+    grace = ARCHIVE_GRACE_HOURS if grace_hours is None else grace_hours
+    cutoff = now - timedelta(hours=grace)
+    hot = Booking._get_collection()
+    cold = BookingArchive._get_collection()
+    moved = 0
+    last_id = None
+
+    while True:
+        query = {'ends_at': {'$lt': cutoff}}
+        if last_id is not None:
+            query['booking_id'] = {'$gt': last_id}
+        batch = list(hot.find(query, sort=[('booking_id', 1)], limit=batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['booking_id']
+        batch_ids = [d['booking_id'] for d in batch]
+        archived = {
+            booking_id
+            for chunk in cold.find({'booking_ids': {'$in': batch_ids}}, {'_id': 0, 'booking_ids': 1})
+            for booking_id in chunk['booking_ids']
+        }
+
+        groups = defaultdict(list)
+        for doc in batch:
+            if doc['booking_id'] in archived:
+                continue
+            groups[(doc.get('venue') or DEFAULT_VENUE, doc['user_id'], doc['ends_at'].strftime('%Y-%m'))].append(doc)
+
+        writes = []
+        for (venue, user_id, month), docs in groups.items():
+            booking_ids = [d['booking_id'] for d in docs]
+            for d in docs:
+                d.pop('_id', None)
+            writes.append(UpdateOne(
+                {'_id': _chunk_id(booking_ids)},
+                {'$setOnInsert': {
+                    'venue': venue,
+                    'user_id': user_id,
+                    'month': month,
+                    'count': len(docs),
+                    'first_booking_id': min(booking_ids),
+                    'last_booking_id': max(booking_ids),
+                    'booking_ids': sorted(booking_ids),
+                    'data': Binary(_encode(docs)),
+                }},
+                upsert=True,
+            ))
+        if writes:
+            cold.bulk_write(writes, ordered=False)
+        hot.delete_many({'booking_id': {'$in': batch_ids}})
+        moved += len(batch)
+
+    return moved
+
+
+# ---------------- Reading history ----------------
+def archived_months(user_id):
+    """Months with archived bookings for a user, newest first (served from the index)."""
+    return sorted(BookingArchive.objects(user_id=user_id).distinct('month'), reverse=True)
+
+
+def archived_bookings(user_id, month):
+    """Archived booking dicts for one user and month, newest first."""
+    bookings = {}
+    for chunk in BookingArchive.objects(user_id=user_id, month=month).only('data'):
+        # chunks written before booking_ids was stored may overlap
+        for booking in _decode(chunk.data):
+            bookings[booking['booking_id']] = booking
+    return sorted(bookings.values(), key=lambda b: b['booking_id'], reverse=True)
+
+
+# ---------------- Export ----------------
+def _still_hot(hot, docs):
+    """Drop bookings that are also still in the hot collection (an archive run stopped mid-batch)."""
+    ids = [d['booking_id'] for d in docs]
+    live = set(hot.distinct('booking_id', {'booking_id': {'$in': ids}}))
+    return [d for d in docs if d['booking_id'] not in live]
+
+
+def iter_archived_batches(filters=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archived booking dicts matching equality filters, in lists of about batch_size.
+
+    Chunks are read from one cursor and decoded one at a time; bookings also
+    found in the hot collection are left out, so each booking is exported once.
+    """
+    filters = filters or {}
+    hot = Booking._get_collection()
+    cursor = BookingArchive._get_collection().find({}, {'_id': 0, 'data': 1}, no_cursor_timeout=True)
+    batch = []
+    try:
+        for chunk in cursor:
+            batch.extend(
+                doc for doc in _decode(chunk['data'])
+                if all(doc.get(field) == value for field, value in filters.items())
+            )
+            if len(batch) >= batch_size:
+                yield _still_hot(hot, batch)
+                batch = []
+        if batch:
+            yield _still_hot(hot, batch)
+    finally:
+        cursor.close()
@@ -0,0 +1,249 @@
+import csv
+import json
+from itertools import islice
+
+from pymongo import UpdateOne
+
+from .archive import iter_archived_batches
+from .loaders import RequestLoader, invalidate_movie
+from .models import Movie, Booking
+from .schedule import invalid_showtimes, sync_schedules
+from .venues import current_venue
+
+DEFAULT_SEATS_PER_SHOWTIME = 30
+IMPORT_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+BOOKING_EXPORT_FIELDS = (
+    'booking_id', 'user_id', 'movie_id', 'movie_title', 'showtime',
+    'seats_list', 'seats_booked', 'payment_status', 'approval_status', 'venue',
+)
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+# ---------------- Streaming readers ----------------
+def iter_json_array(fp, chunk_size=64 * 1024):
+    """Yield the objects of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        # skip separators between values
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise ImportRowError("JSON file must contain an array of movies")
+            buffer = buffer[1:].lstrip()
+            started = True
+        if started and buffer[:1] == ',':
+            buffer = buffer[1:].lstrip()
+        if started and buffer[:1] == ']':
+            return
+
+        if buffer and started:
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                buffer = buffer[end:]
+                continue
+
+        if eof:
+            if buffer.strip():
+                raise ImportRowError("Unexpected end of JSON file")
+            return
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_json_lines(fp):
+    """Yield one object per line; a line that isn't JSON comes out as an ImportRowError."""
+    for line in fp:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ImportRowError(f"invalid JSON: {e.msg}")
+
+
+def iter_rows(fp, fmt):
+    if fmt == 'csv':
+        return csv.DictReader(fp)
+    if fmt == 'jsonl':
+        return iter_json_lines(fp)
+    if fmt == 'json':
+        return iter_json_array(fp)
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def detect_format(path):
+    lowered = path.lower()
+    if lowered.endswith('.csv'):
+        return 'csv'
+    if lowered.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'json'
+
+
+# ---------------- Import ----------------
+def movie_from_row(row):
+    """Validate one CSV/JSON row into the fields stored on Movie."""
+    if isinstance(row, ImportRowError):
+        raise row
+    if not isinstance(row, dict):
+        raise ImportRowError("each movie must be an object")
+    title = str(row.get('title') or '').strip()
+    type_ = str(row.get('type') or '').strip()
+    if not title or not type_:
+        raise ImportRowError("title and type are required")
+
+    showtimes = row.get('showtimes') or []
+    if isinstance(showtimes, str):
+        showtimes = showtimes.replace(';', ',').split(',')
+    if not isinstance(showtimes, list) or not all(isinstance(s, str) for s in showtimes):
+        raise ImportRowError("showtimes must be a list of strings")
+    showtimes = [s.strip() for s in showtimes if s and s.strip()]
+    bad = invalid_showtimes(showtimes)
+    if bad:
+        raise ImportRowError(f"invalid showtimes: {', '.join(bad)}")
+
+    try:
+        movie_id = int(row['movie_id']) if row.get('movie_id') not in (None, '') else None
+        duration = int(row['duration']) if row.get('duration') not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ImportRowError("movie_id and duration must be whole numbers")
+
+    return Movie(
+        movie_id=movie_id,
+        title=title,
+        type=type_,
+        duration=duration,
+        poster=str(row.get('poster') or '').strip() or None,
+        showtimes=showtimes,
+    )
+
+
+def _upsert(movie):
+    fields = {
+        'title': movie.title,
+        'type': movie.type,
+        'duration': movie.duration,
+        'poster': movie.poster,
+        'showtimes': movie.showtimes,
+    }
+    return UpdateOne(
+        {'movie_id': movie.movie_id},
+        {
+            '$set': fields,
+            '$setOnInsert': {
+                'venue': current_venue(),
+                'available_seats': {st: DEFAULT_SEATS_PER_SHOWTIME for st in movie.showtimes},
+                'booked_seats': {},
+            },
+        },
+        upsert=True,
+    )
+
+
+def import_movies(rows, batch_size=IMPORT_BATCH_SIZE, schedule=True, on_error=None, on_batch=None):
+    """Upsert movies from an iterable of rows in bulk_write batches; returns (upserted, modified, skipped).
+
+    on_batch(upserted, modified, skipped) gets the running totals after each
+    batch is written, so a caller can say what was saved if reading fails later.
+    """
+    last = Movie.objects.order_by('-movie_id').only('movie_id').first()
+    next_id = (last.movie_id + 1) if last else 1
+    collection = Movie._get_collection()
+    upserted = modified = skipped = 0
+
+    rows = iter(rows)
+    line = 0
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        movies = []
+        for row in chunk:
+            line += 1
+            try:
+                movie = movie_from_row(row)
+            except ImportRowError as e:
+                skipped += 1
+                if on_error:
+                    on_error(line, e)
+                continue
+            if movie.movie_id is None:
+                movie.movie_id = next_id
+            next_id = max(next_id, movie.movie_id + 1)
+            movies.append(movie)
+
+        if movies:
+            result = collection.bulk_write([_upsert(m) for m in movies], ordered=False)
+            upserted += result.upserted_count
+            modified += result.modified_count
+            for movie in movies:
+                invalidate_movie(movie.movie_id)
+            if schedule:
+                sync_schedules(movies)
+        if on_batch:
+            on_batch(upserted, modified, skipped)
+
+    return upserted, modified, skipped
+
+
+# ---------------- Export ----------------
+def iter_booking_rows(filters=None, batch_size=EXPORT_BATCH_SIZE, include_archived=False):
+    """Yield booking export rows batch by batch.
+
+    Covers the bookings in the hot collection, read from one server-side
+    cursor in booking_id order. Bookings moved to the archive (see
+    archive.archive_finished_bookings) follow, unordered, only when
+    include_archived is set.
+    """
+    loader = RequestLoader()
+
+    def rows(batch):
+        loader.movie_meta_many({doc['movie_id'] for doc in batch})
+        for doc in batch:
+            yield [
+                doc.get('booking_id'),
+                doc.get('user_id'),
+                doc.get('movie_id'),
+                loader.movie_title(doc['movie_id']),
+                doc.get('showtime'),
+                ' '.join(doc.get('seats_list') or []),
+                doc.get('seats_booked'),
+                doc.get('payment_status'),
+                doc.get('approval_status'),
+                doc.get('venue') or current_venue(),
+            ]
+
+    projection = {field: 1 for field in BOOKING_EXPORT_FIELDS if field != 'movie_title'}
+    projection['_id'] = 0
+    cursor = Booking._get_collection().find(
+        filters or {},
+        projection,
+        sort=[('booking_id', 1)],
+        batch_size=batch_size,
+        no_cursor_timeout=True,
+    )
+    try:
+        while True:
+            batch = list(islice(cursor, batch_size))
+            if not batch:
+                break
+            yield from rows(batch)
+    finally:
+        cursor.close()
+
+    if include_archived:
+        for batch in iter_archived_batches(filters, batch_size):
+            yield from rows(batch)
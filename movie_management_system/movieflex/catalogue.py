@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import json
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from mongoengine.queryset.visitor import Q
+
+try:
+    import orjson
+except ImportError:  # stdlib json is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+from .models import Movie, Screening
+from .schedule import screening_key, screenings_for
+from .seating import DEFAULT_LAYOUT
+
+API_PAGE_SIZE = getattr(settings, 'CATALOGUE_API_PAGE_SIZE', 50)
+API_MAX_PAGE_SIZE = 200
+# Clients may reuse catalogue pages this long before revalidating with their ETag
+API_MAX_AGE = getattr(settings, 'CATALOGUE_API_MAX_AGE', 30)
+MIN_COMPRESS_BYTES = 200
+
+MOVIE_FIELDS = ('movie_id', 'title', 'type', 'duration', 'poster', 'showtimes')
+SCREENING_FIELDS = ('movie_id', 'movie_title', 'showtime', 'starts_at', 'ends_at')
+
+_accepts_brotli = re.compile(r'\bbr\b')
+_gzip = GZipMiddleware(lambda request: None)
+
+
+class BadQuery(ValueError):
+    pass
+
+
+# ---------------- Query parameters ----------------
+def select_fields(param, allowed, required=()):
+    """Fields named in ?fields=a,b (all of `allowed` when absent), plus `required`."""
+    if not param:
+        return list(allowed)
+    fields = [f.strip() for f in param.split(',') if f.strip()]
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown:
+        raise BadQuery(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys([*required, *fields]))
+
+
+def page_size(param):
+    if not param:
+        return API_PAGE_SIZE
+    try:
+        size = int(param)
+    except ValueError:
+        raise BadQuery("limit must be a whole number")
+    return max(1, min(size, API_MAX_PAGE_SIZE))
+
+
+def parse_int(param, name):
+    if not param:
+        return None
+    try:
+        return int(param)
+    except ValueError:
+        raise BadQuery(f"{name} must be a whole number")
+
+
+def _encode_cursor(starts_at, oid):
+    text = f"{starts_at.isoformat()}|{oid}"
+    return base64.urlsafe_b64encode(text.encode()).rstrip(b'=').decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        text = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        starts_at, oid = text.split('|')
+        return datetime.fromisoformat(starts_at), ObjectId(oid)
+    except (ValueError, InvalidId):
+        raise BadQuery("Invalid cursor")
+
+
+# ---------------- Queries (raw documents, never hydrated) ----------------
+def movie_page(fields, after=None, limit=API_PAGE_SIZE, genre=None):
+    """(rows, next_cursor) for movies ordered by movie_id, starting after `after`."""
+    qs = Movie.objects(movie_id__gt=after) if after is not None else Movie.objects
+    if genre:
+        qs = qs(type=genre)
+    rows = list(qs.order_by('movie_id').only(*fields).exclude('id').limit(limit + 1).as_pymongo())
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]['movie_id']
+    return rows, None
+
+
+def movie_detail(movie_id, fields):
+    return Movie.objects(movie_id=movie_id).only(*fields).exclude('id').as_pymongo().first()
+
+
+def movie_availability(movie_id, now=None):
+    """Booked and free seat counts per upcoming screening, or None for an unknown movie."""
+    movie = Movie.objects(movie_id=movie_id).only('movie_id', 'title', 'duration', 'showtimes', 'booked_seats').first()
+    if movie is None:
+        return None
+    booked_map = movie.booked_seats or {}
+    capacity = DEFAULT_LAYOUT.capacity  # the seat map booking_add sells from
+    screenings = []
+    for screening in screenings_for(movie, now=now):
+        booked = booked_map.get(screening_key(screening.starts_at)) or []
+        screenings.append({
+            'showtime': screening.showtime,
+            'starts_at': screening.starts_at,
+            'capacity': capacity,
+            'available': max(0, capacity - len(booked)),
+            'booked_seats': booked,
+        })
+    return {'movie_id': movie_id, 'screenings': screenings}
+
+
+def screening_page(fields, after=None, limit=API_PAGE_SIZE, movie_id=None, now=None):
+    """(rows, next_cursor) for upcoming screenings ordered by (starts_at, id)."""
+    qs = Screening.objects(starts_at__gte=now or timezone.now())
+    if movie_id is not None:
+        qs = qs(movie_id=movie_id)
+    if after:
+        starts_at, oid = _decode_cursor(after)
+        qs = qs(Q(starts_at__gt=starts_at) | Q(starts_at=starts_at, id__gt=oid))
+    rows = list(qs.order_by('starts_at', 'id').only(*fields).limit(limit + 1).as_pymongo())
+    cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        cursor = _encode_cursor(rows[-1]['starts_at'], rows[-1]['_id'])
+    for row in rows:
+        del row['_id']
+    return rows, cursor
+
+
+# ---------------- Responses ----------------
+def _default(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        return value.isoformat() + 'Z'
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    """JSON bytes; stored datetimes are UTC and come out as ...Z."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def _compress(request, response):
+    if (brotli is not None and response.status_code == 200
+            and len(response.content) >= MIN_COMPRESS_BYTES
+            and _accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))):
+        response.content = brotli.compress(response.content, quality=5)
+        response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = 'br'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.get('ETag', '').startswith('"'):
+            response['ETag'] = 'W/' + response['ETag']
+        return response
+    return _gzip.process_response(request, response)
+
+
+def api_response(request, data, max_age=API_MAX_AGE):
+    """Compressed JSON response with a content ETag; 304 when the client's copy is current."""
+    body = dumps(data)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=max_age)
+    return _compress(request, response)
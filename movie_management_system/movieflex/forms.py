@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from .models import Movie, Booking
+from .seating import DEFAULT_LAYOUT, SEATS_PER_ROW
 
 # ------------------------
 # User Registrations Forms (SQLite)
@@ -78,18 +79,33 @@ class MovieForm(forms.Form):
 # Booking Form (MongoDB)
 # -----------------------------
 class BookingForm(forms.Form):
-    showtime = forms.ChoiceField(
-        choices=[],  # Will be populated dynamically in the view
+    screening = forms.ChoiceField(
+        choices=[],  # upcoming screenings, populated in the view
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     seats = forms.CharField(
+        required=False,
         help_text="Enter seat codes separated by commas, e.g., A1,A2",
         widget=forms.TextInput(attrs={'class': 'form-control'})
     )
+    party_size = forms.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=SEATS_PER_ROW,
+        label="Find me seats together",
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
 
     def clean_seats(self):
         seats = self.cleaned_data.get('seats', '')
         seats_list = [s.strip().upper() for s in seats.split(',') if s.strip()]
-        if not seats_list:
-            raise ValidationError("You must enter at least one seat.")
+        unknown = [s for s in seats_list if DEFAULT_LAYOUT.parse(s) is None]
+        if unknown:
+            raise ValidationError(f"Unknown seats: {', '.join(unknown)}")
         return seats_list
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('seats') and not cleaned_data.get('party_size'):
+            raise ValidationError("Pick at least one seat or enter how many seats you need together.")
+        return cleaned_data
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Movie, Booking
+from .venues import current_venue
+
+# Shared cache for movie metadata (titles, posters...). 0 turns it off.
+MOVIE_META_CACHE_TTL = getattr(settings, 'MOVIE_META_CACHE_TTL', 30)
+MOVIE_META_CACHE_ALIAS = getattr(settings, 'MOVIE_META_CACHE_ALIAS', 'default')
+MOVIE_META_FIELDS = ('movie_id', 'title', 'type', 'duration', 'poster', 'showtimes')
+
+
+def _meta_key(movie_id):
+    # movie ids are only unique within a venue
+    return f'movieflex:movie-meta:{current_venue()}:{movie_id}'
+
+
+def invalidate_movie(movie_id):
+    if MOVIE_META_CACHE_TTL:
+        caches[MOVIE_META_CACHE_ALIAS].delete(_meta_key(movie_id))
+
+
+class RequestLoader:
+    """Per-request identity map for Movie and Booking lookups.
+
+    Full documents are fetched at most once per request. Movie metadata is
+    loaded in one `movie_id__in` query for all misses and kept in a short-TTL
+    shared cache, since it rarely changes and is what most views display.
+    """
+
+    def __init__(self):
+        self._movies = {}
+        self._bookings = {}
+        self._meta = {}
+
+    # ---------------- Movies ----------------
+    def movie(self, movie_id):
+        """Full Movie document (with seat maps), or None."""
+        movie_id = int(movie_id)
+        if movie_id not in self._movies:
+            self._movies[movie_id] = Movie.objects(movie_id=movie_id).first()
+        return self._movies[movie_id]
+
+    def movie_meta_many(self, movie_ids):
+        """{movie_id: metadata dict} for the movies that exist."""
+        wanted = {int(i) for i in movie_ids} - self._meta.keys()
+        if wanted and MOVIE_META_CACHE_TTL:
+            cache = caches[MOVIE_META_CACHE_ALIAS]
+            cached = cache.get_many([_meta_key(i) for i in wanted])
+            for meta in cached.values():
+                self._meta[meta['movie_id']] = meta
+            wanted -= self._meta.keys()
+
+        if wanted:
+            fetched = {}
+            for doc in Movie.objects(movie_id__in=list(wanted)).only(*MOVIE_META_FIELDS).as_pymongo():
+                doc.pop('_id', None)
+                fetched[doc['movie_id']] = doc
+            self._meta.update(fetched)
+            # remember misses too so a deleted movie isn't looked up again this request
+            for missing in wanted - fetched.keys():
+                self._meta[missing] = None
+            if fetched and MOVIE_META_CACHE_TTL:
+                caches[MOVIE_META_CACHE_ALIAS].set_many(
+                    {_meta_key(i): meta for i, meta in fetched.items()}, MOVIE_META_CACHE_TTL
+                )
+
+        ids = {int(i) for i in movie_ids}
+        return {i: self._meta[i] for i in ids if self._meta.get(i)}
+
+    def movie_meta(self, movie_id):
+        return self.movie_meta_many([movie_id]).get(int(movie_id))
+
+    def movie_title(self, movie_id):
+        meta = self.movie_meta(movie_id)
+        return meta['title'] if meta else f"Movie #{movie_id}"
+
+    # ---------------- Bookings ----------------
+    def booking(self, booking_id, user_id=None):
+        """Booking by id, or None; with user_id, only if it belongs to that user."""
+        booking_id = int(booking_id)
+        if booking_id not in self._bookings:
+            self._bookings[booking_id] = Booking.objects(booking_id=booking_id).first()
+        booking = self._bookings[booking_id]
+        if booking is not None and user_id is not None and booking.user_id != user_id:
+            return None
+        return booking
+
+
+class RequestLoaderMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.loader = RequestLoader()
+        return self.get_response(request)
+
+
+def get_loader(request):
+    loader = getattr(request, 'loader', None)
+    if loader is None:
+        loader = request.loader = RequestLoader()
+    return loader
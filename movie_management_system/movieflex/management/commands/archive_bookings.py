@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from movieflex.archive import ARCHIVE_BATCH_SIZE, ARCHIVE_GRACE_HOURS, archive_finished_bookings
+from movieflex.venues import VENUES, use_venue
+
+
+class Command(BaseCommand):
+    help = "Move bookings for finished screenings into the compressed bookings_archive collection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=ARCHIVE_GRACE_HOURS,
+                            help="Only archive screenings that ended at least this long ago.")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--venue', choices=list(VENUES), help="Only archive this venue (default: all).")
+
+    def handle(self, *args, **options):
+        for venue in [options['venue']] if options['venue'] else VENUES:
+            with use_venue(venue):
+                moved = archive_finished_bookings(grace_hours=options['grace_hours'], batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Archived {moved} bookings at {venue}."))
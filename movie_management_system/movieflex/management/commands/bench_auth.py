@@ -0,0 +1,87 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils.crypto import get_random_string
+
+from movieflex.models import Booking
+from movieflex.passwords import AUTH_HASH_WORKERS, verify
+from movieflex.seating import SeatLayout, find_block
+from movieflex.tickets import ticket_token
+
+BOOKING_PROBE_INTERVAL = 0.005
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a login storm and report logins/s and booking-path latency (p50/p99), "
+        "hashing inline on request threads vs in the bounded hashing pool. The booking path "
+        "is only its CPU work, a seat search plus HMAC ticket signing; no booking request is "
+        "sent and nothing touches the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=48)
+        parser.add_argument('--concurrency', type=int, default=16, help="Request threads sending logins.")
+        parser.add_argument('--workers', type=int, help=f"Hashing pool size (default AUTH_HASH_WORKERS={AUTH_HASH_WORKERS}).")
+
+    def handle(self, *args, **options):
+        # tickets signed here are thrown away, so no real TICKET_SIGNING_KEY is needed
+        with override_settings(TICKET_SIGNING_KEY=get_random_string(32)):
+            self.run_storms(options)
+
+    def run_storms(self, options):
+        encoded = make_password('correct horse')  # current PASSWORD_HASHERS, full cost
+        workers = options['workers'] or AUTH_HASH_WORKERS
+        layout = SeatLayout(rows='ABCDEFGHIJKLMNOPQRST', seats_per_row=25)
+        bitmaps = layout.free_bitmaps([layout.seat_code(r, c) for r in range(0, 20, 2) for c in range(25)])
+        booking = Booking(booking_id=1, movie_id=1, showtime='19:00', seats_list=['A1', 'A2'])
+
+        def booking_path():
+            # stands in for a booking request's CPU work: seat search plus ticket signing
+            find_block(4, bitmaps, layout)
+            ticket_token(booking)
+
+        def probe(stop):
+            latencies = []
+            while not stop.is_set():
+                started = time.perf_counter()
+                booking_path()
+                latencies.append(time.perf_counter() - started)
+                time.sleep(BOOKING_PROBE_INTERVAL)
+            return latencies
+
+        def storm(login):
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=1) as prober:
+                probing = prober.submit(probe, stop)
+                started = time.perf_counter()
+                if login:
+                    with ThreadPoolExecutor(max_workers=options['concurrency']) as requests:
+                        list(requests.map(lambda _: login(), range(options['logins'])))
+                else:
+                    time.sleep(1)
+                elapsed = time.perf_counter() - started
+                stop.set()
+                latencies = sorted(probing.result())
+            return elapsed, latencies
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='auth-hash')
+        scenarios = (
+            ('no logins', None),
+            (f"inline x{options['concurrency']}", lambda: verify('correct horse', encoded)),
+            (f"pool x{workers}", lambda: pool.submit(verify, 'correct horse', encoded).result()),
+        )
+        for label, login in scenarios:
+            elapsed, latencies = storm(login)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            rate = f"{options['logins'] / elapsed:6.1f} logins/s" if login else ' ' * 15
+            self.stdout.write(
+                f"{label:>12}: {rate}  booking p50 {statistics.median(latencies) * 1000:6.2f} ms"
+                f"  p99 {p99 * 1000:6.2f} ms  ({len(latencies)} probes)"
+            )
+        pool.shutdown()
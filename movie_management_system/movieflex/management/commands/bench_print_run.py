@@ -0,0 +1,43 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils.crypto import get_random_string
+
+from movieflex.printing import PRINT_RUN_WORKERS, get_pool, render_tickets, stream_zip
+from movieflex.models import Booking
+from movieflex.tickets import ticket_token
+
+
+class Command(BaseCommand):
+    help = "Compare print-run throughput of the process pool against single-process rendering."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=300)
+        parser.add_argument('--workers', type=int, help=f"Pool size (default PRINT_RUN_WORKERS={PRINT_RUN_WORKERS}).")
+
+    def handle(self, *args, **options):
+        jobs = []
+        # benchmark tickets are thrown away, so they're signed with a one-off key
+        with override_settings(TICKET_SIGNING_KEY=get_random_string(32)):
+            for i in range(1, options['tickets'] + 1):
+                booking = Booking(booking_id=i, movie_id=1, showtime='19:00', seats_list=[f"{'ABCDEFGH'[i % 8]}{i % 8 + 1}"])
+                jobs.append((i, ticket_token(booking), ['Benchmark', 'Showtime: 19:00', f"Booking #{i}"]))
+
+        workers = options['workers'] or PRINT_RUN_WORKERS
+        if options['workers']:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            pool = get_pool()
+        # Start the workers before timing so process start-up isn't counted
+        list(render_tickets(jobs[:workers], pool=pool))
+
+        for label, run_pool in (('single process', False), (f'{workers} processes', pool)):
+            started = time.perf_counter()
+            size = sum(len(chunk) for chunk in stream_zip(render_tickets(jobs, pool=run_pool, window=workers * 2)))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:>16}: {len(jobs) / elapsed:7.1f} tickets/s ({elapsed:.2f}s, {size / 1024:.0f} KiB zip)"
+            )
@@ -0,0 +1,58 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movieflex.bulk import IMPORT_BATCH_SIZE, ImportRowError, detect_format, import_movies, iter_rows
+from movieflex.venues import DEFAULT_VENUE, VENUES, use_venue
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream movies from a CSV, JSON array or JSON Lines file and upsert them by movie_id. "
+        "Columns: movie_id (optional), title, type, duration, poster, showtimes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=['csv', 'json', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--no-schedule', action='store_true', help="Don't rebuild screenings for imported movies.")
+        parser.add_argument('--venue', choices=list(VENUES), default=DEFAULT_VENUE, help="Cinema the movies belong to.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+
+        def report(line, error):
+            self.stderr.write(f"Row {line} skipped: {error}")
+
+        committed = (0, 0, 0)
+
+        def progress(*totals):
+            nonlocal committed
+            committed = totals
+
+        try:
+            fp = open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+        try:
+            with fp, use_venue(options['venue']):
+                upserted, modified, skipped = import_movies(
+                    iter_rows(fp, fmt),
+                    batch_size=options['batch_size'],
+                    schedule=not options['no_schedule'],
+                    on_error=report,
+                    on_batch=progress,
+                )
+        except (ImportRowError, ValueError, csv.Error) as e:
+            # the file itself is unreadable from here on; earlier batches are already saved
+            upserted, modified, skipped = committed
+            raise CommandError(
+                f"Cannot read {path}: {e}. Imported {upserted} new movies, updated {modified}, "
+                f"skipped {skipped} before the error."
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {upserted} new movies, updated {modified}, skipped {skipped}."
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import BulkWriteError
+
+from movieflex.rebalance import PARTITIONED, REBALANCE_BATCH_SIZE, rebalance
+
+
+class Command(BaseCommand):
+    help = (
+        "Move movies, screenings and bookings into the database of the venue they belong to, "
+        "reading every connected alias, including ones no venue uses any more. "
+        "Run after changing MOVIEFLEX_VENUES, ideally while the moved venues are quiet; safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would move.")
+        parser.add_argument('--batch-size', type=int, default=REBALANCE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        verb = "Would move" if options['dry_run'] else "Moved"
+        for document_cls in PARTITIONED:
+            name = document_cls._meta['collection']
+            try:
+                moved = rebalance(document_cls, batch_size=options['batch_size'], dry_run=options['dry_run'])
+            except BulkWriteError as e:
+                raise CommandError(f"{name}: {e.details['writeErrors'][0]['errmsg']}")
+            for (source, target), count in sorted(moved.items(), key=str):
+                if target is None:
+                    self.stderr.write(f"{count} {name} at {source} name an unknown venue; left in place.")
+                else:
+                    self.stdout.write(f"{verb} {count} {name} from {source} to {target}.")
+        self.stdout.write(self.style.SUCCESS("Rebalance finished."))
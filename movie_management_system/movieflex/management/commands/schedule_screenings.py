@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from movieflex.models import Movie
+from movieflex.schedule import sync_schedule
+from movieflex.seating import drop_past_seats
+from movieflex.venues import VENUES, use_venue
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild upcoming screenings for every movie and drop the seat maps of past ones "
+        "(run daily to roll the schedule forward)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movie-id', type=int, help="Only rebuild this movie's schedule.")
+        parser.add_argument('--venue', choices=list(VENUES), help="Only this venue (default: all).")
+
+    def handle(self, *args, **options):
+        total = cleared = 0
+        for venue in [options['venue']] if options['venue'] else VENUES:
+            with use_venue(venue):
+                movies = Movie.objects
+                if options.get('movie_id'):
+                    movies = movies(movie_id=options['movie_id'])
+                for movie in movies.only('movie_id', 'title', 'duration', 'showtimes'):
+                    total += sync_schedule(movie)
+                if not options.get('movie_id'):
+                    cleared += drop_past_seats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Scheduled {total} upcoming screenings; cleared past seat maps on {cleared} movies."
+        ))
@@ -1,17 +1,21 @@
-from mongoengine import Document, StringField, IntField, ListField, DictField
+from pymongo import ReturnDocument
+from mongoengine import Document, StringField, IntField, ListField, DictField, DateTimeField, FloatField, BinaryField
+
+from .venues import VenueRouted, current_venue, fan_out
 
 # ------------------------
 # Movies Collections model 
 # -------------------------
-class Movie(Document):
+class Movie(VenueRouted, Document):
     movie_id = IntField(required=True, unique=True)  # optional: auto-generate in code
+    venue = StringField(default=current_venue)       # cinema; decides which database holds it
     title = StringField(required=True, max_length=200)
     type = StringField(required=True)          # e.g., "Action", "Comedy"
     duration = IntField() 
     poster = StringField()                         # in minutes
     showtimes = ListField(StringField())        # e.g., ["13:00", "17:00"]
     available_seats = DictField()               # { '13:00': 30, '17:00': 30 }
-    booked_seats = DictField(default=dict)      # { '13:00': ['A1','A2'] }
+    booked_seats = DictField(default=dict)      # per screening: { '2099-01-01T13:00': ['A1','A2'] }
 
     meta = {
         'collection': 'movies'
@@ -24,8 +28,9 @@ class Movie(Document):
 # -----------------------------
 # Bookings Collection
 # -----------------------------
-class Booking(Document):
-    booking_id = IntField(required=True, unique=True)  # unique booking number
+class Booking(VenueRouted, Document):
+    booking_id = IntField(required=True, unique=True)  # unique booking number, across all venues
+    venue = StringField(default=current_venue)         # cinema; same as the movie's
     user_id = IntField(required=True)                  # links to SQLite User.id
     movie_id = IntField(required=True)                 # links to Movie.movie_id
     seats_list = ListField(StringField())               # e.g., ['A1','A2']
@@ -33,5 +38,109 @@ class Booking(Document):
     showtime = StringField()
     payment_status = StringField(choices=['Pending','Paid','Cancelled'], default='Pending')
     approval_status = StringField(choices=['Pending','Approved','Rejected'], default='Pending')
+    scanned_at = DateTimeField()                       # set when the ticket is used at the door
+    scan_batch = StringField()                         # id of the scan batch that used it
+    starts_at = DateTimeField()                        # UTC start of the booked screening
+    ends_at = DateTimeField()                          # UTC end; drives archiving
+
+    meta = {
+        'collection': 'bookings',
+        'indexes': [
+            ('movie_id', 'starts_at', 'scanned_at'),        # door scans
+            ('movie_id', 'starts_at', 'approval_status'),   # print runs
+            'user_id',
+            'ends_at',
+        ],
+    }
+
+
+# -----------------------------
+# Screenings Collection (dated schedule)
+# -----------------------------
+class Screening(VenueRouted, Document):
+    movie_id = IntField(required=True)                 # links to Movie.movie_id
+    venue = StringField(default=current_venue)
+    movie_title = StringField(max_length=200)          # copied from Movie so listings need one query
+    showtime = StringField(required=True)              # label in Movie.showtimes it was expanded from
+    starts_at = DateTimeField(required=True)           # UTC
+    ends_at = DateTimeField(required=True)             # UTC, starts_at + duration
+
+    meta = {
+        'collection': 'screenings',
+        'ordering': ['starts_at'],
+        'indexes': [
+            # id breaks ties so the catalogue API can page by (starts_at, id)
+            ('starts_at', 'id'),
+            ('movie_id', 'starts_at', 'id'),
+            # TTL index: MongoDB removes a screening once it has finished
+            {'fields': ['ends_at'], 'expireAfterSeconds': 0},
+        ],
+    }
+
+    def __str__(self):
+        return f"{self.movie_title} @ {self.starts_at:%Y-%m-%d %H:%M}"
+
+
+# -----------------------------
+# Admission control state (one document per gate)
+# -----------------------------
+class AdmissionState(Document):
+    name = StringField(primary_key=True)               # e.g. "booking"
+    leases = ListField(DictField())                    # in-flight requests: [{'id': ..., 'exp': epoch}]
+    next_ticket = IntField(default=0)                  # last waiting-room ticket handed out
+    serving = IntField(default=0)                      # tickets up to this number may enter
+    advanced_at = FloatField(default=0)                # epoch of the last waiting-room advance
+
+    meta = {'collection': 'admission'}
+
+
+# -----------------------------
+# Archived Bookings (cold tier)
+# -----------------------------
+class BookingArchive(VenueRouted, Document):
+    id = StringField(primary_key=True)                 # hash of the booking ids, makes archiving idempotent
+    venue = StringField()
+    user_id = IntField(required=True)
+    month = StringField(required=True)                 # "2025-10", month the screenings ended
+    count = IntField(default=0)
+    first_booking_id = IntField()
+    last_booking_id = IntField()
+    booking_ids = ListField(IntField())                # so a rerun can skip bookings already archived
+    data = BinaryField()                               # zlib-compressed JSON lines of booking documents
+
+    meta = {
+        'collection': 'bookings_archive',
+        'indexes': [
+            ('user_id', 'month'),
+            'booking_ids',
+        ],
+    }
+
+
+# -----------------------------
+# Sequence counters (shared by all venues, on the default connection)
+# -----------------------------
+class Counter(Document):
+    name = StringField(primary_key=True)               # e.g. "booking_id"
+    seq = IntField(default=0)                          # last value handed out
+
+    meta = {'collection': 'counters'}
+
+
+def _highest_booking_id():
+    hot = Booking.objects.order_by('-booking_id').only('booking_id').first()
+    cold = BookingArchive.objects.order_by('-last_booking_id').only('last_booking_id').first()
+    return max(hot.booking_id if hot else 0, cold.last_booking_id if cold else 0)
+
 
-    meta = {'collection': 'bookings'}
+def next_booking_id():
+    """Atomically allocate a booking id; safe across workers and after bookings are archived."""
+    collection = Counter._get_collection()
+    inc = {'$inc': {'seq': 1}}
+    doc = collection.find_one_and_update({'_id': 'booking_id'}, inc, return_document=ReturnDocument.AFTER)
+    if doc is None:
+        # First use: continue after the highest id in any venue's hot and archived tiers
+        start = max(fan_out(_highest_booking_id).values())
+        collection.update_one({'_id': 'booking_id'}, {'$max': {'seq': start}}, upsert=True)
+        doc = collection.find_one_and_update({'_id': 'booking_id'}, inc, return_document=ReturnDocument.AFTER)
+    return doc['seq']
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+# PBKDF2 releases the GIL, so this is how many cores sign-ups and logins may
+# use at once; the rest stay free for booking requests.
+AUTH_HASH_WORKERS = getattr(settings, 'AUTH_HASH_WORKERS', None) or max(1, (os.cpu_count() or 2) // 2)
+# Hashes queued or running before further logins are turned away with a 503
+AUTH_HASH_MAX_PENDING = getattr(settings, 'AUTH_HASH_MAX_PENDING', None) or AUTH_HASH_WORKERS * 8
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(AUTH_HASH_MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def get_pool():
+    """Thread pool shared by all password hashing in this worker, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix='auth-hash')
+        return _pool
+
+
+def submit(fn, *args):
+    """Queue fn on the hashing pool; raises HashingBusy when the queue is full."""
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = get_pool().submit(fn, *args)
+    except BaseException:
+        _pending.release()
+        raise
+    # released when the hash finishes, even if the waiting request has gone away
+    future.add_done_callback(lambda f: _pending.release())
+    return future
+
+
+def verify(raw, encoded):
+    """(matches, new hash or None); the new hash is set when the stored one uses outdated hasher settings."""
+    upgraded = []
+    matches = check_password(raw, encoded, setter=lambda password: upgraded.append(make_password(password)))
+    return matches, (upgraded[0] if upgraded else None)
+
+
+# ---------------- Async helpers for views ----------------
+async def ahash_password(raw):
+    return await asyncio.wrap_future(submit(make_password, raw))
+
+
+async def averify_password(user, raw):
+    """Check a password in the hashing pool, saving an upgraded hash if needed.
+
+    With no user, one hash is still spent so unknown accounts answer as slowly
+    as wrong passwords.
+    """
+    if user is None:
+        await asyncio.wrap_future(submit(make_password, raw))
+        return False
+    matches, upgraded = await asyncio.wrap_future(submit(verify, raw, user.password))
+    if upgraded:
+        user.password = upgraded
+        await user.asave(update_fields=['password'])
+    return matches
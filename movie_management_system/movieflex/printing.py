@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .models import Booking
+from .ticket_images import render_ticket_png
+from .tickets import ticket_token
+
+PRINT_RUN_WORKERS = getattr(settings, 'PRINT_RUN_WORKERS', None) or os.cpu_count() or 1
+# Tickets submitted to the pool ahead of the one being streamed; bounds memory
+# and lets a cancelled download drop the rest of its run
+PRINT_RUN_WINDOW = getattr(settings, 'PRINT_RUN_WINDOW', None) or PRINT_RUN_WORKERS * 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process pool shared by all print runs in this worker, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded web server process is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=PRINT_RUN_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+# ---------------- Jobs ----------------
+def print_run_jobs(movie_id, starts_at, movie_title=''):
+    """One render job per approved booking of a screening, read from a single cursor."""
+    cursor = Booking._get_collection().find(
+        {'movie_id': movie_id, 'starts_at': starts_at, 'approval_status': 'Approved'},
+        {'_id': 0, 'booking_id': 1, 'movie_id': 1, 'showtime': 1, 'starts_at': 1, 'seats_list': 1},
+        sort=[('booking_id', 1)],
+    )
+    for doc in cursor:
+        booking = Booking(
+            booking_id=doc['booking_id'],
+            movie_id=doc['movie_id'],
+            showtime=doc.get('showtime'),
+            starts_at=doc.get('starts_at'),
+            seats_list=doc.get('seats_list') or [],
+        )
+        yield (
+            booking.booking_id,
+            ticket_token(booking),
+            [
+                movie_title,
+                f"Screening: {booking.starts_at:%a %d %b %Y, %H:%M} UTC",
+                f"Seats: {', '.join(booking.seats_list)}",
+                f"Booking #{booking.booking_id}",
+            ],
+        )
+
+
+def render_tickets(jobs, pool=None, window=PRINT_RUN_WINDOW):
+    """(booking_id, png) pairs in job order; rendered in the process pool unless pool is False.
+
+    At most `window` jobs are read and submitted ahead of the result being
+    yielded. Closing the generator cancels the ones not yet started.
+    """
+    if pool is False:
+        return map(render_ticket_png, jobs)
+    return _render_windowed(pool or get_pool(), jobs, window)
+
+
+def _render_windowed(pool, jobs, window):
+    pending = deque()
+    try:
+        for job in jobs:
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(pool.submit(render_ticket_png, job))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# ---------------- Streaming ZIP ----------------
+class _ChunkSink:
+    # Write-only file for ZipFile; it has no tell()/seek(), so zipfile streams
+    # entries with data descriptors and we hand out bytes as they are written.
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(rendered):
+    """Yield a ZIP archive of ticket PNGs piece by piece as tickets finish rendering.
+
+    If the download is abandoned, `rendered` is closed so queued renders are dropped.
+    """
+    sink = _ChunkSink()
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for booking_id, png in rendered:
+                archive.writestr(f"ticket_{booking_id}.png", png)
+                yield sink.drain()
+        yield sink.drain()
+    finally:
+        close = getattr(rendered, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from mongoengine.connection import get_db
+from pymongo import ReplaceOne
+
+from .models import Movie, Screening, Booking, BookingArchive
+from .venues import DEFAULT_VENUE, VENUES, connected_aliases, use_venue
+
+REBALANCE_BATCH_SIZE = 500
+# Movies first, so a moved booking never points at a movie that hasn't arrived yet
+PARTITIONED = (Movie, Screening, Booking, BookingArchive)
+
+
+def _misplaced(venue):
+    if venue is None:
+        # no venue maps to this alias any more, so everything on it has to move
+        return {}
+    # documents without a venue predate partitioning and belong to the default venue
+    if venue == DEFAULT_VENUE:
+        return {'venue': {'$nin': [venue, None]}}
+    return {'venue': {'$ne': venue}}
+
+
+def rebalance(document_cls, batch_size=REBALANCE_BATCH_SIZE, dry_run=False):
+    """Move documents stored in another venue's database to their own; returns {(source, target): count}.
+
+    Every connected alias is scanned, including ones no venue maps to any
+    more (e.g. after a venue moved to a new alias); such a source is named by
+    its alias. Each batch is upserted by _id into the target and then deleted
+    from the source, so an interrupted run is safe to repeat. Documents naming
+    a venue that is not configured stay put and are counted under (source, None).
+    """
+    venue_at = {alias: venue for venue, alias in VENUES.items()}
+    moved = defaultdict(int)
+    for alias in connected_aliases():
+        venue = venue_at.get(alias)
+        source = venue or alias
+        source_collection = get_db(alias)[document_cls._get_collection_name()]
+        last_id = None
+
+        while True:
+            query = _misplaced(venue)
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            batch = list(source_collection.find(query, sort=[('_id', 1)], limit=batch_size))
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+
+            by_target = defaultdict(list)
+            for doc in batch:
+                by_target[doc.get('venue') or DEFAULT_VENUE].append(doc)
+            for target, docs in by_target.items():
+                if target not in VENUES:
+                    moved[(source, None)] += len(docs)
+                    continue
+                moved[(source, target)] += len(docs)
+                if dry_run:
+                    continue
+                with use_venue(target):
+                    target_collection = document_cls._get_collection()
+                target_collection.bulk_write([ReplaceOne({'_id': d['_id']}, d, upsert=True) for d in docs], ordered=False)
+                source_collection.delete_many({'_id': {'$in': [d['_id'] for d in docs]}})
+
+    return dict(moved)
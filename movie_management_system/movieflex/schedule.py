@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Screening
+
+# How many days ahead a daily "13:00" showtime is expanded into screenings
+SCHEDULE_DAYS_AHEAD = getattr(settings, 'SCHEDULE_DAYS_AHEAD', 7)
+# Used when a movie has no duration set
+DEFAULT_SCREENING_MINUTES = getattr(settings, 'DEFAULT_SCREENING_MINUTES', 120)
+MAX_PLAYING_SOON_HOURS = 24 * 7
+# A screening is named by its UTC start; also the value of an <input type="datetime-local">
+SCREENING_KEY_FORMAT = '%Y-%m-%dT%H:%M'
+
+
+# ---------------- Showtime parsing ----------------
+def parse_showtime(label):
+    """Return ('daily', time) for "13:00" or ('once', datetime) for "2025-11-02 13:00", else None."""
+    label = (label or '').strip()
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M'):
+        try:
+            return 'once', datetime.strptime(label, fmt)
+        except ValueError:
+            pass
+    try:
+        return 'daily', datetime.strptime(label, '%H:%M').time()
+    except ValueError:
+        return None
+
+
+def invalid_showtimes(showtimes):
+    return [s for s in showtimes if parse_showtime(s) is None]
+
+
+# ---------------- Screening keys ----------------
+def screening_key(starts_at):
+    """Key of a concrete screening, e.g. "2099-01-01T13:00"; Movie.booked_seats is keyed by it."""
+    if timezone.is_aware(starts_at):
+        starts_at = starts_at.astimezone(dt_timezone.utc)
+    return starts_at.strftime(SCREENING_KEY_FORMAT)
+
+
+def parse_screening_key(key):
+    """The aware UTC start named by a screening key, or None."""
+    try:
+        return datetime.strptime((key or '').strip(), SCREENING_KEY_FORMAT).replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        return None
+
+
+# ---------------- Building screenings ----------------
+def screenings_for(movie, now=None, days=None):
+    """Concrete upcoming Screening documents (unsaved) for a movie's showtime labels."""
+    now = now or timezone.now()
+    days = SCHEDULE_DAYS_AHEAD if days is None else days
+    length = timedelta(minutes=movie.duration or DEFAULT_SCREENING_MINUTES)
+    today = timezone.localdate(now)
+
+    starts = []
+    for label in movie.showtimes or []:
+        parsed = parse_showtime(label)
+        if parsed is None:
+            continue
+        kind, value = parsed
+        if kind == 'once':
+            starts.append((label, timezone.make_aware(value)))
+        else:
+            for offset in range(days):
+                day = today + timedelta(days=offset)
+                starts.append((label, timezone.make_aware(datetime.combine(day, value))))
+
+    return [
+        Screening(
+            movie_id=movie.movie_id,
+            movie_title=movie.title,
+            showtime=label,
+            starts_at=start,
+            ends_at=start + length,
+        )
+        for label, start in sorted(starts, key=lambda item: item[1])
+        if start > now
+    ]
+
+
+def sync_schedule(movie, now=None):
+    """Replace a movie's upcoming screenings; finished ones are left for the TTL index."""
+    return sync_schedules([movie], now=now)
+
+
+def sync_schedules(movies, now=None):
+    """sync_schedule for many movies with one delete and one insert."""
+    now = now or timezone.now()
+    Screening.objects(movie_id__in=[m.movie_id for m in movies], starts_at__gt=now).delete()
+    screenings = [s for movie in movies for s in screenings_for(movie, now=now)]
+    if screenings:
+        Screening.objects.insert(screenings, load_bulk=False)
+    return len(screenings)
+
+
+def clear_schedule(movie_id):
+    Screening.objects(movie_id=movie_id).delete()
+
+
+# ---------------- Queries ----------------
+def playing_soon(hours, now=None):
+    """Screenings starting in the next `hours`, one range scan on the starts_at index."""
+    now = now or timezone.now()
+    hours = max(1, min(int(hours), MAX_PLAYING_SOON_HOURS))
+    return Screening.objects(
+        starts_at__gte=now,
+        starts_at__lt=now + timedelta(hours=hours),
+    ).order_by('starts_at')
+
@@ -0,0 +1,149 @@
+from django.utils import timezone
+from pymongo import UpdateOne
+
+from .models import Movie
+from .schedule import parse_screening_key
+
+# Seat map rendered by booking_form.html: rows A-H, seats 1-8
+SEAT_ROWS = 'ABCDEFGH'
+SEATS_PER_ROW = 8
+
+# Rows a little behind the middle are the most wanted; a step away from the
+# preferred row costs as much as this many seats away from the aisle centre.
+ROW_WEIGHT = 1.5
+PREFERRED_ROW_RATIO = 0.6
+
+
+class SeatLayout:
+    def __init__(self, rows=SEAT_ROWS, seats_per_row=SEATS_PER_ROW):
+        self.rows = rows
+        self.seats_per_row = seats_per_row
+        self.full_row = (1 << seats_per_row) - 1
+        self.preferred_row = int((len(rows) - 1) * PREFERRED_ROW_RATIO)
+        self.row_index = {r: i for i, r in enumerate(rows)}
+        self.capacity = len(rows) * seats_per_row
+
+    def seat_code(self, row, col):
+        return f"{self.rows[row]}{col + 1}"
+
+    def parse(self, code):
+        """'C5' -> (2, 4), or None for codes outside the layout."""
+        row = self.row_index.get(code[:1])
+        try:
+            col = int(code[1:]) - 1
+        except ValueError:
+            return None
+        if row is None or not 0 <= col < self.seats_per_row:
+            return None
+        return row, col
+
+    def free_bitmaps(self, booked):
+        """One int per row, bit i set when seat i+1 is free."""
+        bitmaps = [self.full_row] * len(self.rows)
+        for code in booked or []:
+            pos = self.parse(code)
+            if pos:
+                bitmaps[pos[0]] &= ~(1 << pos[1])
+        return bitmaps
+
+
+DEFAULT_LAYOUT = SeatLayout()
+
+
+# ---------------- Search ----------------
+def find_block(n, bitmaps, layout=DEFAULT_LAYOUT):
+    """Best block of n adjacent free seats in one row, as seat codes, or None."""
+    if n < 1 or n > layout.seats_per_row:
+        return None
+
+    row_centre = (layout.seats_per_row - 1) / 2
+    best = None
+    best_score = None
+    for row, free in enumerate(bitmaps):
+        # bit i of `starts` is set when seats i..i+n-1 are all free
+        starts = free
+        for k in range(1, n):
+            starts &= free >> k
+        if not starts:
+            continue
+
+        row_cost = abs(row - layout.preferred_row) * ROW_WEIGHT
+        if best_score is not None and row_cost >= best_score:
+            continue
+        while starts:
+            low = starts & -starts
+            col = low.bit_length() - 1
+            starts ^= low
+            score = row_cost + abs(col + (n - 1) / 2 - row_centre)
+            if best_score is None or score < best_score:
+                best, best_score = (row, col), score
+
+    if best is None:
+        return None
+    row, col = best
+    return [layout.seat_code(row, c) for c in range(col, col + n)]
+
+
+# ---------------- Claiming ----------------
+# Seats are claimed per concrete screening: `screening` is its key from
+# schedule.screening_key, so Monday's 13:00 and Tuesday's are separate houses.
+def claim_seats(movie_id, screening, seats):
+    """Add seats to booked_seats only if none of them is taken yet; True on success."""
+    key = f'booked_seats.{screening}'
+    result = Movie._get_collection().update_one(
+        {'movie_id': movie_id, key: {'$nin': list(seats)}},
+        {'$push': {key: {'$each': list(seats)}}},
+    )
+    return result.modified_count == 1
+
+
+def release_seats(movie_id, screening, seats):
+    """Give back seats claimed for a booking that was never saved."""
+    key = f'booked_seats.{screening}'
+    Movie._get_collection().update_one(
+        {'movie_id': movie_id},
+        {'$pull': {key: {'$in': list(seats)}}},
+    )
+
+
+def claim_best_block(movie_id, screening, n, layout=DEFAULT_LAYOUT, attempts=3):
+    """Find and claim n seats together; re-reads and retries when a concurrent booking wins."""
+    collection = Movie._get_collection()
+    for _ in range(attempts):
+        doc = collection.find_one(
+            {'movie_id': movie_id},
+            {f'booked_seats.{screening}': 1},
+        )
+        if doc is None:
+            return None
+        booked = (doc.get('booked_seats') or {}).get(screening, [])
+        seats = find_block(n, layout.free_bitmaps(booked), layout)
+        if seats is None:
+            return None
+        if claim_seats(movie_id, screening, seats):
+            return seats
+    return None
+
+
+def drop_past_seats(now=None):
+    """Forget the seat maps of screenings that have started; returns movies updated.
+
+    Seat maps saved under a bare showtime label before screenings were dated
+    are left alone.
+    """
+    now = now or timezone.now()
+    collection = Movie._get_collection()
+    writes = []
+    for doc in collection.find({}, {'_id': 0, 'movie_id': 1, 'booked_seats': 1}):
+        past = [
+            key for key in (doc.get('booked_seats') or {})
+            if (parse_screening_key(key) or now) < now
+        ]
+        if past:
+            writes.append(UpdateOne(
+                {'movie_id': doc['movie_id']},
+                {'$unset': {f'booked_seats.{key}': '' for key in past}},
+            ))
+    if writes:
+        collection.bulk_write(writes, ordered=False)
+    return len(writes)
@@ -1,3 +1,1293 @@
-from django.test import TestCase
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import timeit
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import mongomock
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from mongoengine import connect, disconnect
+from mongoengine.errors import NotUniqueError
+from mongoengine.connection import get_db
+
+from . import admission, catalogue, passwords, venues
+from .archive import archive_finished_bookings, archived_months, archived_bookings
+from .bulk import import_movies, iter_json_array, iter_rows
+from .loaders import RequestLoader
+from .models import Movie, Booking, BookingArchive, Screening, next_booking_id
+from .schedule import (
+    parse_screening_key, parse_showtime, playing_soon, screening_key, screenings_for, sync_schedule, sync_schedules,
+)
+from .printing import print_run_jobs, render_tickets, stream_zip
+from .rebalance import rebalance
+from .seating import SeatLayout, DEFAULT_LAYOUT, find_block, claim_seats, claim_best_block, drop_past_seats
+from .tickets import InvalidTicket, ticket_token, verify_ticket, scan_tickets
 
 # my tests files.
+
+TICKET_KEY = 'test-ticket-signing-key'
+# Test logins must not write session files into the source tree
+CACHE_SESSIONS = 'django.contrib.sessions.backends.cache'
+
+
+def reset_mongo():
+    disconnect()
+    connect('movieflex_test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    admission.booking_gate._snapshot = None
+    cache.clear()
+
+
+class MongoTestMixin:
+    """Point MongoEngine at an in-memory mongomock database for each test."""
+
+    def setUp(self):
+        super().setUp()
+        reset_mongo()
+
+    def tearDown(self):
+        disconnect()
+        super().tearDown()
+
+
+MONGO_COMMANDS = (
+    'find', 'find_one', 'count_documents', 'distinct', 'aggregate',
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+    'delete_one', 'delete_many', 'find_one_and_update', 'bulk_write',
+)
+
+
+@contextlib.contextmanager
+def count_mongo_commands():
+    """Record every top-level mongomock collection call as (collection, command, args)."""
+    calls = []
+    state = threading.local()
+
+    def wrap(name, original):
+        def counted(self, *args, **kwargs):
+            if getattr(state, 'depth', 0) == 0:
+                calls.append((self.name, name, args[:1]))
+            state.depth = getattr(state, 'depth', 0) + 1
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                state.depth -= 1
+        return counted
+
+    with contextlib.ExitStack() as stack:
+        for name in MONGO_COMMANDS:
+            original = getattr(mongomock.collection.Collection, name)
+            stack.enter_context(mock.patch.object(mongomock.collection.Collection, name, wrap(name, original)))
+        yield calls
+
+
+# -----------------------------
+# Schedule
+# -----------------------------
+@override_settings(SESSION_ENGINE=CACHE_SESSIONS)
+class ScheduleTests(MongoTestMixin, TestCase):
+    NOW = datetime(2099, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        self.movie = Movie(movie_id=1, title='Dune', type='Sci-Fi', duration=150,
+                           showtimes=['13:00', '2099-01-02 20:30', 'soon'])
+        self.movie.save()
+
+    def test_parse_showtime(self):
+        self.assertEqual(parse_showtime('13:00'), ('daily', time(13, 0)))
+        self.assertEqual(parse_showtime(' 2099-01-02 20:30 '), ('once', datetime(2099, 1, 2, 20, 30)))
+        self.assertEqual(parse_showtime('2099-01-02T20:30'), ('once', datetime(2099, 1, 2, 20, 30)))
+        self.assertIsNone(parse_showtime('soon'))
+        self.assertIsNone(parse_showtime(None))
+
+    def test_screenings_for_expands_daily_and_once_labels(self):
+        screenings = screenings_for(self.movie, now=self.NOW, days=3)
+        self.assertEqual(
+            [(s.showtime, s.starts_at) for s in screenings],
+            [
+                ('13:00', datetime(2099, 1, 1, 13, 0, tzinfo=dt_timezone.utc)),
+                ('13:00', datetime(2099, 1, 2, 13, 0, tzinfo=dt_timezone.utc)),
+                ('2099-01-02 20:30', datetime(2099, 1, 2, 20, 30, tzinfo=dt_timezone.utc)),
+                ('13:00', datetime(2099, 1, 3, 13, 0, tzinfo=dt_timezone.utc)),
+            ],
+        )
+        self.assertEqual(screenings[0].ends_at - screenings[0].starts_at, timedelta(minutes=150))
+
+    def test_screenings_for_skips_started_screenings(self):
+        later = self.NOW.replace(hour=14)
+        screenings = screenings_for(self.movie, now=later, days=1)
+        self.assertEqual([s.showtime for s in screenings], ['2099-01-02 20:30'])
+
+    def test_sync_schedule_replaces_upcoming_screenings(self):
+        self.assertEqual(sync_schedule(self.movie, now=self.NOW), 8)
+        self.movie.showtimes = ['18:00']
+        sync_schedule(self.movie, now=self.NOW)
+        self.assertEqual(set(Screening.objects.distinct('showtime')), {'18:00'})
+        self.assertEqual(Screening.objects.count(), 7)
+
+    def test_playing_soon_is_a_window_on_starts_at(self):
+        sync_schedule(self.movie, now=self.NOW)
+        soon = list(playing_soon(12, now=self.NOW))
+        self.assertEqual([s.showtime for s in soon], ['13:00'])
+        soon = list(playing_soon(36, now=self.NOW))
+        self.assertEqual([s.showtime for s in soon], ['13:00', '13:00', '2099-01-02 20:30'])
+
+    def test_screening_keys_round_trip(self):
+        starts_at = datetime(2099, 1, 2, 20, 30, tzinfo=dt_timezone.utc)
+        self.assertEqual(screening_key(starts_at), '2099-01-02T20:30')
+        self.assertEqual(screening_key(datetime(2099, 1, 2, 20, 30)), '2099-01-02T20:30')
+        self.assertEqual(parse_screening_key('2099-01-02T20:30'), starts_at)
+        self.assertIsNone(parse_screening_key('13:00'))
+        self.assertIsNone(parse_screening_key(None))
+
+    def test_view_links_each_screening_to_its_own_booking(self):
+        self.movie.showtimes = ['13:00']
+        sync_schedule(self.movie)
+        self.client.force_login(User.objects.create_user('ann', 'ann@example.com', 'pw'))
+        response = self.client.get(reverse('movie_playing_soon'), {'hours': 48})
+        self.assertEqual(response.status_code, 200)
+        screenings = response.context['screenings']
+        self.assertGreaterEqual(len(screenings), 2)
+        for screening in screenings:
+            key = screening_key(screening.starts_at).replace(':', '%3A')
+            self.assertContains(response, f"{reverse('booking_add', args=[1])}?screening={key}", count=1)
+        self.assertContains(response, '<option value="48" selected>', html=False)
+
+
+# -----------------------------
+# Seat finder
+# -----------------------------
+class FindBlockTests(SimpleTestCase):
+    def test_empty_house_picks_centre_of_preferred_row(self):
+        seats = find_block(2, DEFAULT_LAYOUT.free_bitmaps([]))
+        self.assertEqual(seats, ['E4', 'E5'])
+
+    def test_skips_blocks_broken_by_booked_seats(self):
+        booked = ['E4', 'D5', 'F4']
+        seats = find_block(3, DEFAULT_LAYOUT.free_bitmaps(booked))
+        self.assertEqual(len(seats), 3)
+        self.assertFalse(set(seats) & set(booked))
+        rows = {s[0] for s in seats}
+        self.assertEqual(len(rows), 1)
+        cols = sorted(int(s[1:]) for s in seats)
+        self.assertEqual(cols, list(range(cols[0], cols[0] + 3)))
+
+    def test_prefers_centrality_within_a_row(self):
+        # only row A is open: the block should sit in the middle of it
+        booked = [f"{r}{c}" for r in 'BCDEFGH' for c in range(1, 9)]
+        self.assertEqual(find_block(4, DEFAULT_LAYOUT.free_bitmaps(booked)), ['A3', 'A4', 'A5', 'A6'])
+
+    def test_no_block_when_seats_are_scattered(self):
+        booked = [f"{r}{c}" for r in 'ABCDEFGH' for c in range(1, 9, 2)]
+        self.assertIsNone(find_block(2, DEFAULT_LAYOUT.free_bitmaps(booked)))
+        self.assertEqual(len(find_block(1, DEFAULT_LAYOUT.free_bitmaps(booked))), 1)
+
+    def test_rejects_impossible_sizes(self):
+        free = DEFAULT_LAYOUT.free_bitmaps([])
+        self.assertIsNone(find_block(0, free))
+        self.assertIsNone(find_block(9, free))
+
+    def test_ignores_unknown_seat_codes(self):
+        self.assertEqual(DEFAULT_LAYOUT.free_bitmaps(['Z1', 'A0', 'A9', 'Bx']), [DEFAULT_LAYOUT.full_row] * 8)
+
+
+class FindBlockBenchmarkTests(SimpleTestCase):
+    def test_search_on_500_seat_auditorium_is_sub_millisecond(self):
+        layout = SeatLayout(rows='ABCDEFGHIJKLMNOPQRST', seats_per_row=25)
+        rng = random.Random(42)
+        codes = [layout.seat_code(r, c) for r in range(20) for c in range(25)]
+        booked = rng.sample(codes, 300)
+        bitmaps = layout.free_bitmaps(booked)
+
+        runs = 1000
+        per_search = min(timeit.repeat(lambda: find_block(4, bitmaps, layout), number=runs, repeat=3)) / runs
+        self.assertLess(per_search, 0.001)
+
+
+SHOW = '2099-01-01T13:00'  # screening key of the '2099-01-01 13:00' showtime
+
+
+class ClaimSeatsTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Movie(movie_id=1, title='Dune', type='Sci-Fi', showtimes=['13:00'],
+              booked_seats={SHOW: ['E4']}).save()
+
+    def test_claim_rejects_overlap(self):
+        self.assertFalse(claim_seats(1, SHOW, ['E3', 'E4']))
+        self.assertTrue(claim_seats(1, SHOW, ['E5', 'E6']))
+        self.assertEqual(Movie.objects.get(movie_id=1).booked_seats[SHOW], ['E4', 'E5', 'E6'])
+
+    def test_claim_best_block_books_adjacent_seats(self):
+        seats = claim_best_block(1, SHOW, 3)
+        self.assertEqual(len(seats), 3)
+        self.assertNotIn('E4', seats)
+        booked = Movie.objects.get(movie_id=1).booked_seats[SHOW]
+        self.assertEqual(booked, ['E4'] + seats)
+
+    def test_same_showtime_on_another_day_has_its_own_seats(self):
+        self.assertEqual(claim_best_block(1, '2099-01-02T13:00', 2), ['E4', 'E5'])
+        self.assertTrue(claim_seats(1, '2099-01-03T13:00', ['E4']))
+        self.assertEqual(Movie.objects.get(movie_id=1).booked_seats[SHOW], ['E4'])
+
+    def test_claim_best_block_full_house(self):
+        full = [f"{r}{c}" for r in 'ABCDEFGH' for c in range(1, 9)]
+        Movie.objects(movie_id=1).update_one(**{'set__booked_seats': {SHOW: full}})
+        self.assertIsNone(claim_best_block(1, SHOW, 1))
+
+    def test_drop_past_seats_keeps_upcoming_screenings(self):
+        Movie.objects(movie_id=1).update_one(**{'set__booked_seats': {
+            '2098-12-31T13:00': ['A1'], SHOW: ['E4'], '13:00': ['B2'],
+        }})
+        now = datetime(2099, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(drop_past_seats(now=now), 1)
+        # legacy label keys are left for the staff to clear
+        self.assertEqual(Movie.objects.get(movie_id=1).booked_seats, {SHOW: ['E4'], '13:00': ['B2']})
+        self.assertEqual(drop_past_seats(now=now), 0)
+
+
+@override_settings(SESSION_ENGINE=CACHE_SESSIONS)
+class BookingAddTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Movie(movie_id=1, title='Dune', type='Sci-Fi', duration=150, showtimes=['2099-01-01 13:00'],
+              booked_seats={SHOW: ['E4']}).save()
+        self.user = User.objects.create_user('ann', 'ann@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def test_party_size_books_seats_together(self):
+        response = self.client.post(reverse('booking_add', args=[1]), {'screening': SHOW, 'party_size': 2})
+        self.assertRedirects(response, reverse('booking_list'), fetch_redirect_response=False)
+        booking = Booking.objects.get(user_id=self.user.id)
+        self.assertEqual(booking.seats_booked, 2)
+        self.assertNotIn('E4', booking.seats_list)
+        self.assertEqual((booking.showtime, booking.starts_at), ('2099-01-01 13:00', datetime(2099, 1, 1, 13, 0)))
+        self.assertEqual(booking.ends_at, datetime(2099, 1, 1, 15, 30))
+
+    def test_unknown_screening_is_rejected(self):
+        response = self.client.post(reverse('booking_add', args=[1]), {'screening': '2099-01-02T13:00', 'seats': 'A1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_get_preselects_the_linked_screening(self):
+        response = self.client.get(reverse('booking_add', args=[1]), {'screening': SHOW})
+        self.assertEqual(response.context['form']['screening'].value(), SHOW)
+
+    def test_manual_seats_reject_overlap(self):
+        response = self.client.post(reverse('booking_add', args=[1]), {'screening': SHOW, 'seats': 'E3,E4'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Seats already booked: E4')
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_failed_save_releases_claimed_seats(self):
+        with mock.patch.object(Booking, 'save', side_effect=NotUniqueError('duplicate booking_id')):
+            with self.assertRaises(NotUniqueError):
+                self.client.post(reverse('booking_add', args=[1]), {'screening': SHOW, 'seats': 'H7,H8'})
+        self.assertEqual(Movie.objects.get(movie_id=1).booked_seats[SHOW], ['E4'])
+
+    def test_requires_seats_or_party_size(self):
+        response = self.client.post(reverse('booking_add', args=[1]), {'screening': SHOW})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Booking.objects.count(), 0)
+
+
+# -----------------------------
+# Admission control
+# -----------------------------
+class GateTests(MongoTestMixin, TestCase):
+    def test_shared_capacity_is_enforced(self):
+        gate = admission.Gate('test', capacity=2, local_capacity=5)
+        first, second = gate.acquire(), gate.acquire()
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+        self.assertIsNone(gate.acquire())
+        gate.release(first)
+        self.assertIsNotNone(gate.acquire())
+
+    def test_local_capacity_short_circuits(self):
+        gate = admission.Gate('test', capacity=10, local_capacity=1)
+        self.assertIsNotNone(gate.acquire())
+        self.assertIsNone(gate.acquire())
+
+    def test_expired_leases_are_reclaimed(self):
+        gate = admission.Gate('test', capacity=1, local_capacity=5)
+        gate.acquire()
+        gate._collection().update_one({'_id': 'test'}, {'$set': {'leases.0.exp': 0}})
+        self.assertIsNotNone(gate.acquire())
+
+    def test_waiting_room_is_fifo(self):
+        gate = admission.Gate('test', capacity=1, local_capacity=5)
+        lease = gate.acquire()
+        first, second = gate.take_ticket(), gate.take_ticket()
+        self.assertEqual(gate.advance(), 0)
+        gate.release(lease)
+        self.assertEqual(gate.advance(), first)
+        # the bucket was just emptied, so the next ticket waits for a refill
+        self.assertEqual(gate.advance(), first)
+        gate._collection().update_one({'_id': 'test'}, {'$set': {'advanced_at': 0}})
+        self.assertEqual(gate.advance(), second)
+
+
+@override_settings(SESSION_ENGINE=CACHE_SESSIONS)
+class AdmissionViewTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Movie(movie_id=1, title='Dune', type='Sci-Fi', showtimes=['13:00']).save()
+        self.client.force_login(User.objects.create_user('ann', 'ann@example.com', 'pw'))
+        self.booking_url = reverse('booking_add', args=[1])
+
+    def test_booking_open_when_queue_empty(self):
+        self.assertEqual(self.client.get(self.booking_url).status_code, 200)
+
+    def test_newcomers_queue_behind_waiting_users(self):
+        admission.booking_gate.take_ticket()
+        response = self.client.get(self.booking_url)
+        self.assertRedirects(response, admission.waiting_room_url(self.booking_url), fetch_redirect_response=False)
+
+    def test_waiting_room_admits_with_signed_token(self):
+        gate = admission.Gate('booking', capacity=1, local_capacity=5)
+        with mock.patch.object(admission, 'booking_gate', gate), mock.patch('movieflex.views.booking_gate', gate):
+            lease = gate.acquire()
+            gate.take_ticket()
+            response = self.client.get(admission.waiting_room_url(self.booking_url))
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, '1</strong> person ahead of you')
+
+            # a slot frees up and goes to the ticket ahead, who never comes back
+            gate.release(lease)
+            self.assertContains(self.client.get(admission.waiting_room_url(self.booking_url)), '0</strong> people ahead')
+
+            gate._collection().update_one({'_id': 'booking'}, {'$set': {'advanced_at': 0}})
+
+            response = self.client.get(admission.waiting_room_url(self.booking_url))
+            self.assertRedirects(response, self.booking_url, fetch_redirect_response=False)
+            self.assertIn(admission.ADMISSION_COOKIE, response.cookies)
+            self.assertEqual(self.client.get(self.booking_url).status_code, 200)
+
+    def test_token_only_admits_the_user_it_was_issued_to(self):
+        admission.booking_gate.take_ticket()
+        self.assertEqual(self.client.get(self.booking_url).status_code, 302)
+        response = self.client.get(reverse('movie_list'))
+        admission.issue_admission(response.wsgi_request, response, 1)
+        self.client.cookies[admission.ADMISSION_COOKIE] = response.cookies[admission.ADMISSION_COOKIE].value
+        self.assertEqual(self.client.get(self.booking_url).status_code, 200)
+
+        self.client.force_login(User.objects.create_user('bob', 'bob@example.com', 'pw'))
+        self.client.cookies[admission.ADMISSION_COOKIE] = response.cookies[admission.ADMISSION_COOKIE].value
+        self.assertEqual(self.client.get(self.booking_url).status_code, 302)
+
+    def test_forged_token_is_ignored(self):
+        admission.booking_gate.take_ticket()
+        self.client.cookies[admission.ADMISSION_COOKIE] = 'forged'
+        self.assertEqual(self.client.get(self.booking_url).status_code, 302)
+
+    def test_browsing_is_not_gated(self):
+        admission.booking_gate.take_ticket()
+        self.assertEqual(self.client.get(reverse('movie_list')).status_code, 200)
+
+
+# -----------------------------
+# Request loader
+# -----------------------------
+class RequestLoaderTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(1, 4):
+            Movie(movie_id=i, title=f'Movie {i}', type='Drama', showtimes=['13:00']).save()
+        Booking(booking_id=1, user_id=7, movie_id=1, seats_list=['A1'], seats_booked=1, showtime='13:00').save()
+
+    def test_repeated_gets_hit_mongo_once(self):
+        loader = RequestLoader()
+        with count_mongo_commands() as calls:
+            self.assertIs(loader.movie(1), loader.movie('1'))
+            self.assertIs(loader.booking(1), loader.booking(1, user_id=7))
+        self.assertEqual(len(calls), 2, calls)
+
+    def test_booking_owner_check(self):
+        loader = RequestLoader()
+        self.assertIsNone(loader.booking(1, user_id=8))
+        self.assertIsNone(loader.booking(99))
+
+    def test_metadata_is_batched(self):
+        loader = RequestLoader()
+        with count_mongo_commands() as calls:
+            meta = loader.movie_meta_many([1, 2, 3, 404])
+            loader.movie_title(2)
+            self.assertEqual(loader.movie_title(404), 'Movie #404')
+        self.assertEqual(sorted(meta), [1, 2, 3])
+        self.assertEqual(len(calls), 1, calls)
+
+    def test_metadata_shared_cache_spans_requests(self):
+        RequestLoader().movie_meta_many([1, 2])
+        with count_mongo_commands() as calls:
+            self.assertEqual(RequestLoader().movie_meta(2)['title'], 'Movie 2')
+        self.assertEqual(calls, [])
+
+
+# -----------------------------
+# Bulk import / export
+# -----------------------------
+class IterJsonArrayTests(SimpleTestCase):
+    def test_streams_across_chunk_boundaries(self):
+        movies = [{'title': f'Movie {i}', 'showtimes': ['13:00']} for i in range(50)]
+        fp = io.StringIO(json.dumps(movies, indent=2))
+        self.assertEqual(list(iter_json_array(fp, chunk_size=7)), movies)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '))), [])
+
+    def test_truncated_file(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"title": "x"}, {"title"')))
+
+
+class ImportMoviesTests(MongoTestMixin, TestCase):
+    CSV = (
+        "movie_id,title,type,duration,poster,showtimes\n"
+        "1,Dune,Sci-Fi,155,,\"13:00,19:00\"\n"
+        ",Heat,Crime,170,,21:00\n"
+        ",,Crime,90,,21:00\n"
+        "7,Alien,Horror,117,,25:99\n"
+    )
+
+    def test_csv_upserts_in_batches(self):
+        Movie(movie_id=1, title='Old title', type='Sci-Fi', showtimes=['13:00'],
+              booked_seats={'13:00': ['A1']}).save()
+        errors = []
+        with count_mongo_commands() as calls:
+            result = import_movies(iter_rows(io.StringIO(self.CSV), 'csv'), batch_size=10,
+                                   schedule=False, on_error=lambda line, e: errors.append(line))
+        self.assertEqual(result, (1, 1, 2))
+        self.assertEqual(errors, [3, 4])
+        self.assertEqual([c[1] for c in calls].count('bulk_write'), 1)
+
+        dune = Movie.objects.get(movie_id=1)
+        self.assertEqual(dune.title, 'Dune')
+        self.assertEqual(dune.showtimes, ['13:00', '19:00'])
+        self.assertEqual(dune.booked_seats, {'13:00': ['A1']})  # existing bookings survive
+        heat = Movie.objects.get(title='Heat')
+        self.assertEqual(heat.movie_id, 2)
+        self.assertEqual(heat.available_seats, {'21:00': 30})
+
+    def test_jsonl_import_builds_schedule(self):
+        lines = '\n'.join(json.dumps({'title': f'M{i}', 'type': 'Drama', 'showtimes': ['2099-01-01 18:00']})
+                          for i in range(5))
+        self.assertEqual(import_movies(iter_rows(io.StringIO(lines), 'jsonl'), batch_size=2), (5, 0, 0))
+        self.assertEqual(Screening.objects.count(), 5)
+
+    def test_malformed_jsonl_lines_are_skipped(self):
+        lines = '{"title": "Dune", "type": "Sci-Fi"}\n{"title": \n\n["Heat"]\n{"title": "Alien", "type": "Horror"}\n'
+        errors = []
+        result = import_movies(iter_rows(io.StringIO(lines), 'jsonl'), schedule=False,
+                               on_error=lambda line, e: errors.append((line, str(e))))
+        self.assertEqual(result, (2, 0, 2))
+        self.assertEqual([line for line, _ in errors], [2, 3])
+        self.assertTrue(errors[0][1].startswith('invalid JSON'))
+        self.assertEqual(errors[1][1], 'each movie must be an object')
+
+    def test_non_object_array_elements_are_skipped(self):
+        fp = io.StringIO(json.dumps([{'title': 'Dune', 'type': 'Sci-Fi'}, 'Heat', 7,
+                                     {'title': 'Alien', 'type': 'Horror', 'showtimes': 1300}]))
+        errors = []
+        result = import_movies(iter_rows(fp, 'json'), schedule=False,
+                               on_error=lambda line, e: errors.append(line))
+        self.assertEqual(result, (1, 0, 3))
+        self.assertEqual(errors, [2, 3, 4])
+
+    def test_command_reports_what_was_saved_before_a_broken_file(self):
+        movies = ','.join(json.dumps({'title': f'M{i}', 'type': 'Drama'}) for i in range(3))
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, content, saved in [('broken.json', f'[{movies}, {{"title"', 2),
+                                         ('object.json', '{"title": "Dune"}', 0)]:
+                path = os.path.join(tmp, name)
+                with open(path, 'w', encoding='utf-8') as fp:
+                    fp.write(content)
+                with self.assertRaisesMessage(CommandError, f'Imported {saved} new movies, updated 0, skipped 0'):
+                    call_command('import_movies', path, '--batch-size', '2', '--no-schedule', stdout=io.StringIO())
+        self.assertEqual(Movie.objects.count(), 2)
+
+
+@override_settings(SESSION_ENGINE=CACHE_SESSIONS)
+class BookingExportTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Movie(movie_id=1, title='Dune', type='Sci-Fi', showtimes=['13:00']).save()
+        for i in range(1, 26):
+            Booking(booking_id=i, user_id=1, movie_id=1, seats_list=[f'A{i % 8 + 1}'], seats_booked=1,
+                    showtime='13:00', payment_status='Paid' if i % 2 else 'Pending').save()
+        self.client.force_login(User.objects.create_user('admin', 'a@example.com', 'pw', is_staff=True))
+
+    def test_streams_csv(self):
+        response = self.client.get(reverse('admin_booking_export'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['booking_id', 'user_id', 'movie_id', 'movie_title'])
+        self.assertEqual(len(lines), 26)
+        self.assertEqual(lines[1].split(',')[:4], ['1', '1', '1', 'Dune'])
+
+    def test_filters(self):
+        response = self.client.get(reverse('admin_booking_export') + '?payment_status=Paid')
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 14)
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user('bob', 'b@example.com', 'pw'))
+        self.assertEqual(self.client.get(reverse('admin_booking_export')).status_code, 404)
+
+
+# -----------------------------
+# Signed tickets and door scanning
+# -----------------------------
+@override_settings(TICKET_SIGNING_KEY=TICKET_KEY)
+class TicketTokenTests(SimpleTestCase):
+    def setUp(self):
+        self.booking = Booking(booking_id=42, movie_id=3, showtime='18:00', starts_at=datetime(2099, 1, 1, 18, 0),
+                               seats_list=['C4', 'C5'])
+
+    def test_round_trip(self):
+        token = ticket_token(self.booking)
+        self.assertTrue(token.startswith('MF2.'))
+        self.assertLess(len(token), 100)
+        self.assertEqual(verify_ticket(token), {
+            'booking_id': 42, 'movie_id': 3, 'showtime': '18:00', 'screening': '2099-01-01T18:00',
+            'seats': ['C4', 'C5'],
+        })
+
+    def test_tampered_payload_is_rejected(self):
+        prefix, payload, signature = ticket_token(self.booking).split('.')
+        other = ticket_token(Booking(booking_id=43, movie_id=3, showtime='2099-01-01 18:00', seats_list=['C4']))
+        with self.assertRaises(InvalidTicket):
+            verify_ticket(f"{prefix}.{other.split('.')[1]}.{signature}")
+
+    def test_garbage_is_rejected(self):
+        for token in ['', 'BookingID:1, Movie:x', 'MF2.abc', 'MF1.a.b', 'MF2.!!.??']:
+            with self.assertRaises(InvalidTicket):
+                verify_ticket(token)
+
+    def test_requires_a_dedicated_signing_key(self):
+        token = ticket_token(self.booking)
+        for key in ['', settings.SECRET_KEY]:
+            with override_settings(TICKET_SIGNING_KEY=key):
+                with self.assertRaises(ImproperlyConfigured):
+                    ticket_token(self.booking)
+                with self.assertRaises(ImproperlyConfigured):
+                    verify_ticket(token)
+
+
+@override_settings(SCANNER_API_KEY='door-key', TICKET_SIGNING_KEY=TICKET_KEY, SESSION_ENGINE=CACHE_SESSIONS)
+class ScanTicketsTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.bookings = []
+        for i, status in enumerate(['Approved', 'Approved', 'Pending'], start=1):
+            booking = Booking(booking_id=i, user_id=1, movie_id=1, showtime='13:00', starts_at=self.STARTS_AT,
+                              seats_list=[f'A{i}'], seats_booked=1, payment_status='Paid', approval_status=status)
+            booking.save()
+            self.bookings.append(booking)
+        self.tokens = [ticket_token(b) for b in self.bookings]
+        # the same showtime the next day
+        self.tomorrow = Booking(booking_id=4, user_id=1, movie_id=1, showtime='13:00', seats_list=['A1'],
+                                starts_at=self.STARTS_AT + timedelta(days=1), approval_status='Approved')
+        self.tomorrow.save()
+
+    STARTS_AT = datetime(2099, 1, 1, 13, 0)
+
+    def scan(self, tokens, key='door-key', screening=SHOW):
+        body = {'movie_id': 1, 'starts_at': screening, 'tokens': tokens}
+        return self.client.post(reverse('api_scan_tickets'), json.dumps(body),
+                                content_type='application/json', HTTP_X_SCANNER_KEY=key)
+
+    def test_batch_uses_one_update_many(self):
+        ghost = ticket_token(Booking(booking_id=99, movie_id=1, starts_at=self.STARTS_AT, seats_list=['H8']))
+        with count_mongo_commands() as calls:
+            results = scan_tickets(self.tokens + [self.tokens[0], 'forged', ghost], 1, SHOW)
+        self.assertEqual([r['status'] for r in results],
+                         ['ok', 'ok', 'not_approved', 'duplicate', 'invalid', 'unknown'])
+        self.assertEqual([c[1] for c in calls], ['update_many', 'find'])
+
+    def test_tickets_for_another_screening_are_turned_away(self):
+        other_movie = ticket_token(Booking(booking_id=5, movie_id=2, starts_at=self.STARTS_AT, seats_list=['A1']))
+        results = self.scan([ticket_token(self.tomorrow), other_movie, self.tokens[0]]).json()['results']
+        self.assertEqual([r['status'] for r in results], ['wrong_screening', 'wrong_screening', 'ok'])
+        self.assertEqual(results[0]['screening'], '2099-01-02T13:00')
+        self.assertIsNone(Booking.objects.get(booking_id=4).scanned_at)
+        # it still gets in at its own screening
+        results = self.scan([ticket_token(self.tomorrow)], screening='2099-01-02T13:00').json()['results']
+        self.assertEqual(results[0]['status'], 'ok')
+
+    def test_second_scan_is_already_used(self):
+        self.assertEqual(self.scan(self.tokens[:1]).json()['results'][0]['status'], 'ok')
+        self.assertEqual(self.scan(self.tokens[:2]).json()['results'][0]['status'], 'already_used')
+
+    def test_requires_scanner_key(self):
+        self.assertEqual(self.scan(self.tokens, key='wrong').status_code, 403)
+        with override_settings(SCANNER_API_KEY=''):
+            self.assertEqual(self.scan(self.tokens, key='').status_code, 403)
+
+    def test_rejects_bad_body(self):
+        response = self.client.post(reverse('api_scan_tickets'), 'nope', content_type='application/json',
+                                    HTTP_X_SCANNER_KEY='door-key')
+        self.assertEqual(response.status_code, 400)
+        for screening in [None, '13:00']:
+            self.assertEqual(self.scan(self.tokens, screening=screening).status_code, 400)
+
+    def test_scanned_export(self):
+        self.scan([self.tokens[1], self.tokens[0]])
+        self.scan([ticket_token(self.tomorrow)], screening='2099-01-02T13:00')
+        url = reverse('api_scanned_tickets') + f'?movie_id=1&starts_at={SHOW}'
+        data = self.client.get(url, HTTP_X_SCANNER_KEY='door-key').json()
+        self.assertEqual((data['starts_at'], data['booking_ids']), (SHOW, [1, 2]))
+        self.assertEqual(self.client.get(reverse('api_scanned_tickets') + '?movie_id=1&showtime=13:00',
+                                         HTTP_X_SCANNER_KEY='door-key').status_code, 400)
+
+        packed = self.client.get(url + '&format=bin', HTTP_X_SCANNER_KEY='door-key').content
+        self.assertEqual(packed, b'\x00\x00\x00\x01\x00\x00\x00\x02')
+
+    def test_scanned_export_rejects_bad_since(self):
+        url = reverse('api_scanned_tickets') + f'?movie_id=1&starts_at={SHOW}&since='
+        for since in ['yesterday', '2099-13-01T00:00', '2099-01-01T10:00:00 02:00']:
+            response = self.client.get(url + since, HTTP_X_SCANNER_KEY='door-key')
+            self.assertEqual(response.status_code, 400, since)
+        response = self.client.get(url + '2099-01-01T10:00:00%2B02:00', HTTP_X_SCANNER_KEY='door-key')
+        self.assertEqual(response.json()['booking_ids'], [])
+
+
+# -----------------------------
+# Box-office print run
+# -----------------------------
+@override_settings(TICKET_SIGNING_KEY=TICKET_KEY, SESSION_ENGINE=CACHE_SESSIONS)
+class PrintRunTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Movie(movie_id=1, title='Dune', type='Sci-Fi', showtimes=['13:00', '19:00']).save()
+        for i in range(1, 8):
+            # booking 7 is for the same showtime a day later
+            starts_at = datetime(2099, 1, 1 if i < 7 else 2, 13 if i < 6 else 19, 0)
+            Booking(booking_id=i, user_id=1, movie_id=1, showtime='13:00' if i < 6 else '19:00',
+                    starts_at=starts_at, seats_list=[f'B{i}'], seats_booked=1, payment_status='Paid',
+                    approval_status='Rejected' if i == 3 else 'Approved').save()
+        self.client.force_login(User.objects.create_user('admin', 'a@example.com', 'pw', is_staff=True))
+
+    def test_jobs_cover_approved_bookings_of_the_screening(self):
+        jobs = list(print_run_jobs(1, datetime(2099, 1, 1, 13, 0, tzinfo=dt_timezone.utc), 'Dune'))
+        self.assertEqual([job[0] for job in jobs], [1, 2, 4, 5])
+        self.assertEqual(verify_ticket(jobs[0][1])['seats'], ['B1'])
+
+    def test_stream_zip_is_valid_and_incremental(self):
+        rendered = render_tickets(print_run_jobs(1, datetime(2099, 1, 1, 13, 0), 'Dune'), pool=False)
+        chunks = list(stream_zip(rendered))
+        self.assertGreater(len(chunks), 4)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertEqual(archive.namelist(), [f'ticket_{i}.png' for i in (1, 2, 4, 5)])
+        self.assertTrue(archive.read('ticket_1.png').startswith(b'\x89PNG'))
+
+    def test_view_streams_zip(self):
+        with mock.patch('movieflex.printing.get_pool', return_value=ThreadPoolExecutor(2)):
+            response = self.client.get(reverse('admin_print_run') + '?movie_id=1&starts_at=2099-01-02T19:00')
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertEqual(zipfile.ZipFile(io.BytesIO(body)).namelist(), ['ticket_7.png'])
+        self.assertIn('tickets_1_2099-01-02T1900.zip', response['Content-Disposition'])
+
+    def test_submission_is_bounded_and_cancelled_with_the_stream(self):
+        pool = mock.Mock()
+        futures = []
+
+        def submit(fn, job):
+            future = mock.Mock()
+            future.result.return_value = (job[0], b'png')
+            futures.append(future)
+            return future
+        pool.submit.side_effect = submit
+
+        read = []
+        jobs = ((read.append(i) or (i, 'token', [])) for i in range(1, 101))
+        stream = stream_zip(render_tickets(jobs, pool=pool, window=3))
+        next(stream)
+        self.assertEqual(read, [1, 2, 3, 4])
+        self.assertEqual(pool.submit.call_count, 3)
+
+        stream.close()
+        self.assertFalse(futures[0].cancel.called)
+        for future in futures[1:]:
+            future.cancel.assert_called_once_with()
+        self.assertEqual(len(read), 4)
+
+    def test_unknown_screening(self):
+        for starts_at in ['', '19:00', '2099-01-01 19:00:00']:
+            response = self.client.get(reverse('admin_print_run') + f'?movie_id=1&starts_at={starts_at}')
+            self.assertEqual(response.status_code, 404, starts_at)
+
+
+# -----------------------------
+# Booking archive
+# -----------------------------
+@override_settings(SESSION_ENGINE=CACHE_SESSIONS)
+class ArchiveTests(MongoTestMixin, TestCase):
+    NOW = datetime(2025, 11, 15, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        Movie(movie_id=1, title='Dune', type='Sci-Fi', showtimes=['13:00']).save()
+        ends = [
+            datetime(2025, 10, 3, 15, 0), datetime(2025, 10, 20, 15, 0),   # October
+            datetime(2025, 11, 1, 15, 0),                                  # November
+            datetime(2025, 11, 15, 2, 0),                                  # inside the grace period
+            datetime(2025, 11, 20, 15, 0),                                 # upcoming
+        ]
+        for i, end in enumerate(ends, start=1):
+            Booking(booking_id=i, user_id=1, movie_id=1, showtime='13:00', seats_list=[f'A{i}'],
+                    seats_booked=1, payment_status='Paid', ends_at=end).save()
+        Booking(booking_id=6, user_id=2, movie_id=1, showtime='13:00', seats_list=['B1'],
+                ends_at=datetime(2025, 10, 3, 15, 0)).save()
+        Booking(booking_id=7, user_id=1, movie_id=1, showtime='13:00', seats_list=['C1']).save()  # legacy, undated
+
+    def test_moves_only_finished_bookings(self):
+        moved = archive_finished_bookings(now=self.NOW, grace_hours=24, batch_size=2)
+        self.assertEqual(moved, 4)
+        self.assertEqual(sorted(Booking.objects.distinct('booking_id')), [4, 5, 7])
+        self.assertEqual(archived_months(1), ['2025-11', '2025-10'])
+        self.assertEqual([b['booking_id'] for b in archived_bookings(1, '2025-10')], [2, 1])
+        self.assertEqual(archived_bookings(2, '2025-10')[0]['seats_list'], ['B1'])
+
+    def test_rerun_after_partial_failure_does_not_duplicate(self):
+        with mock.patch('pymongo.collection.Collection.delete_many'), \
+                mock.patch('mongomock.collection.Collection.delete_many'):
+            archive_finished_bookings(now=self.NOW, batch_size=100)
+        chunks = BookingArchive.objects.count()
+        archive_finished_bookings(now=self.NOW, batch_size=100)
+        self.assertEqual(BookingArchive.objects.count(), chunks)
+        self.assertEqual(sum(c.count for c in BookingArchive.objects), 4)
+
+    def test_new_booking_ids_skip_archived_ones(self):
+        archive_finished_bookings(now=self.NOW)
+        user = User.objects.create_user('ann', 'ann@example.com', 'pw')
+        self.client.force_login(user)
+        upcoming = screenings_for(Movie.objects.get(movie_id=1))[0]
+        self.client.post(reverse('booking_add', args=[1]), {'screening': screening_key(upcoming.starts_at), 'seats': 'D1'})
+        self.assertEqual(Booking.objects.get(seats_list='D1').booking_id, 8)
+
+    def test_rerun_with_a_later_cutoff_does_not_duplicate(self):
+        with mock.patch('pymongo.collection.Collection.delete_many'), \
+                mock.patch('mongomock.collection.Collection.delete_many'):
+            archive_finished_bookings(now=datetime(2025, 10, 6, tzinfo=dt_timezone.utc))
+        self.assertEqual([b['booking_id'] for b in archived_bookings(1, '2025-10')], [1])
+
+        archive_finished_bookings(now=datetime(2025, 10, 22, tzinfo=dt_timezone.utc))
+        self.assertEqual([b['booking_id'] for b in archived_bookings(1, '2025-10')], [2, 1])
+        self.assertEqual(sorted(i for c in BookingArchive.objects for i in c.booking_ids), [1, 2, 6])
+        self.assertEqual(sorted(Booking.objects.distinct('booking_id')), [3, 4, 5, 7])
+
+    def test_export_includes_archive_on_request(self):
+        self.client.force_login(User.objects.create_user('admin', 'a@example.com', 'pw', is_staff=True))
+
+        def exported(query=''):
+            response = self.client.get(reverse('admin_booking_export') + query)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            return sorted(int(line.split(',')[0]) for line in lines[1:])
+
+        with mock.patch('pymongo.collection.Collection.delete_many'), \
+                mock.patch('mongomock.collection.Collection.delete_many'):
+            archive_finished_bookings(now=self.NOW)
+        # a run stopped before deleting leaves bookings in both tiers; each is exported once
+        self.assertEqual(exported('?include_archived'), [1, 2, 3, 4, 5, 6, 7])
+
+        archive_finished_bookings(now=self.NOW)
+        self.assertEqual(exported(), [4, 5, 7])
+        self.assertEqual(exported('?include_archived'), [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(exported('?include_archived&payment_status=Paid'), [1, 2, 3, 4, 5])
+
+    def test_booking_list_pages_into_history(self):
+        archive_finished_bookings(now=self.NOW)
+        self.client.force_login(User.objects.create_user('ann', 'ann@example.com', 'pw'))
+        user = User.objects.get(username='ann')
+        Booking.objects(user_id=1).update(set__user_id=user.id)
+        BookingArchive.objects(user_id=1).update(set__user_id=user.id)
+
+        response = self.client.get(reverse('booking_list'))
+        self.assertContains(response, 'Show past bookings')
+        self.assertEqual(len(response.context['bookings']), 3)
+
+        response = self.client.get(reverse('booking_list') + '?history')
+        self.assertEqual(response.context['history_month'], '2025-11')
+        self.assertEqual([b['booking_id'] for b in response.context['history']], [3])
+
+        response = self.client.get(reverse('booking_list') + '?history=2025-10')
+        self.assertEqual([b['movie_title'] for b in response.context['history']], ['Dune', 'Dune'])
+
+
+# -----------------------------
+# Off-thread password hashing
+# -----------------------------
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    SESSION_ENGINE=CACHE_SESSIONS,
+)
+class AuthViewTests(TestCase):
+    OLD_HASH = MD5PasswordHasher().encode('pw', 'short')  # salt too weak for current settings
+
+    def setUp(self):
+        self.user = User.objects.create_user('ann', 'ann@example.com')
+        self.user.password = self.OLD_HASH
+        self.user.save()
+
+    def login(self, user, password):
+        return self.client.post(reverse('login'), {'user': user, 'password': password})
+
+    def test_login_hashes_in_pool_and_upgrades_old_hash(self):
+        threads = []
+        original = passwords.check_password
+
+        def spy(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return original(*args, **kwargs)
+
+        with mock.patch.object(passwords, 'check_password', spy):
+            response = self.login('ann@example.com', 'pw')
+        self.assertRedirects(response, reverse('movie_list'), fetch_redirect_response=False)
+        self.assertTrue(threads[0].startswith('auth-hash'))
+        self.assertEqual(self.client.session['user_id'], self.user.id)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.password, self.OLD_HASH)
+        self.assertTrue(self.user.check_password('pw'))
+
+    def test_wrong_password_and_unknown_user_are_rejected(self):
+        self.assertContains(self.login('ann', 'nope'), 'Invalid username/email or password.')
+        with mock.patch.object(passwords, 'make_password', wraps=passwords.make_password) as hashed:
+            self.assertContains(self.login('bob', 'pw'), 'Invalid username/email or password.')
+        hashed.assert_called_once_with('pw')  # unknown users cost a hash too
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_register_hashes_in_pool(self):
+        response = self.client.post(reverse('register'), {'username': 'bob', 'email': 'Bob@Example.COM',
+                                                          'password': 'pw', 'confirm_password': 'pw'})
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        user = User.objects.get(username='bob')
+        self.assertEqual(user.email, 'Bob@example.com')
+        self.assertTrue(user.check_password('pw'))
+
+    def test_full_hashing_queue_turns_logins_away(self):
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        with mock.patch.object(passwords, '_pending', full):
+            response = self.login('ann', 'pw')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertContains(response, 'lot of sign-ins', status_code=503)
+
+
+# -----------------------------
+# Catalogue API
+# -----------------------------
+@override_settings(SESSION_ENGINE=CACHE_SESSIONS)
+class CatalogueApiTests(MongoTestMixin, TestCase):
+    NOW = datetime(2099, 11, 15, 12, 0, tzinfo=dt_timezone.utc)  # future, or the TTL index expires screenings
+
+    def setUp(self):
+        super().setUp()
+        for i in range(1, 6):
+            Movie(movie_id=i, title=f'Movie {i}', type=('Drama', 'Action')[i % 2], duration=100,
+                  showtimes=['13:00', '19:00'], booked_seats={'13:00': ['A1', 'A2']}).save()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_movies_page_by_keyset_with_selected_fields(self):
+        url = reverse('api_v1_movies')
+        page = self.get_json(url, fields='title', limit=2)
+        self.assertEqual(page['results'], [{'movie_id': 1, 'title': 'Movie 1'}, {'movie_id': 2, 'title': 'Movie 2'}])
+        ids = [r['movie_id'] for r in page['results']]
+        while page['next']:
+            page = json.loads(self.client.get(page['next']).content)
+            ids += [r['movie_id'] for r in page['results']]
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+        self.assertEqual([r['movie_id'] for r in self.get_json(url, genre='Drama')['results']], [2, 4])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('api_v1_movies'), {'fields': 'title,booked_seats'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'error': 'Unknown fields: booked_seats'})
+
+    def test_conditional_get_returns_304_until_data_changes(self):
+        url = reverse('api_v1_movie', args=[1])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Movie.objects(movie_id=1).update(set__title='Renamed')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(reverse('api_v1_movie', args=[9])).status_code, 404)
+
+    def test_gzip_response_keeps_revalidating(self):
+        url = reverse('api_v1_movies')
+        with mock.patch.object(catalogue, 'brotli', None):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 5)
+        again = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_availability_counts_booked_seats_per_screening(self):
+        Movie.objects(movie_id=1).update_one(set__booked_seats={'2099-11-15T13:00': ['A1', 'A2']})
+        data = catalogue.movie_availability(1, now=self.NOW)
+        self.assertEqual(data['screenings'][0], {
+            'showtime': '13:00', 'starts_at': datetime(2099, 11, 15, 13, 0, tzinfo=dt_timezone.utc),
+            'capacity': 64, 'available': 62, 'booked_seats': ['A1', 'A2'],
+        })
+        # the same showtime tomorrow is a separate screening with its own seats
+        self.assertEqual([s['available'] for s in data['screenings'][1:3]], [64, 64])
+        self.assertIsNone(catalogue.movie_availability(9))
+
+        data = self.get_json(reverse('api_v1_availability', args=[1]))
+        self.assertTrue(data['screenings'][0]['starts_at'].endswith('Z'))
+
+    def test_screenings_page_through_equal_start_times(self):
+        with mock.patch('django.utils.timezone.now', return_value=self.NOW):
+            sync_schedules(list(Movie.objects), now=self.NOW)
+            url = reverse('api_v1_screenings')
+            page = self.get_json(url, limit=3, fields='movie_id')
+            seen = [(r['starts_at'], r['movie_id']) for r in page['results']]
+            while page['next']:
+                page = json.loads(self.client.get(page['next']).content)
+                seen += [(r['starts_at'], r['movie_id']) for r in page['results']]
+        self.assertEqual(len(seen), Screening.objects.count())
+        self.assertEqual(len(set(seen)), len(seen))
+        self.assertEqual(seen[0][0], '2099-11-15T13:00:00Z')
+        self.assertEqual(seen, sorted(seen, key=lambda s: s[0]))
+
+    def test_stdlib_encoder_matches_orjson(self):
+        data = {'at': datetime(2025, 11, 15, 13, 0), 'aware': datetime(2025, 11, 15, 13, 0, tzinfo=dt_timezone.utc)}
+        with mock.patch.object(catalogue, 'orjson', None):
+            fallback = catalogue.dumps(data)
+        self.assertEqual(json.loads(fallback), json.loads(catalogue.dumps(data)))
+
+
+# -----------------------------
+# Venues (one database per cinema)
+# -----------------------------
+@override_settings(SESSION_ENGINE=CACHE_SESSIONS)
+class VenueTests(MongoTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        connect('movieflex_north', alias='north', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+        patcher = mock.patch.dict(venues.VENUES, {'north': 'north'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Movie(movie_id=1, title='Dune', type='Sci-Fi', showtimes=['13:00']).save()
+        with venues.use_venue('north'):
+            Movie(movie_id=1, title='Arrival', type='Sci-Fi', showtimes=['19:00']).save()
+
+    def tearDown(self):
+        disconnect('north')
+        super().tearDown()
+
+    def test_documents_live_in_their_venue_database(self):
+        self.assertEqual([m.title for m in Movie.objects], ['Dune'])
+        with venues.use_venue('north'):
+            self.assertEqual([(m.title, m.venue) for m in Movie.objects], [('Arrival', 'north')])
+        self.assertEqual(get_db('north')['movies'].count_documents({}), 1)
+        with self.assertRaises(venues.UnknownVenue):
+            with venues.use_venue('south'):
+                pass
+
+    def test_fan_out_queries_venues_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def titles():
+            barrier.wait()  # only passes if both venues are being read at once
+            return [m.title for m in Movie.objects]
+
+        with mock.patch.object(venues, '_pool', ThreadPoolExecutor(2)):
+            self.assertEqual(venues.fan_out(titles), {'main': ['Dune'], 'north': ['Arrival']})
+
+    def test_booking_ids_are_unique_across_venues(self):
+        Booking(booking_id=7, user_id=1, movie_id=1).save()
+        with venues.use_venue('north'):
+            Booking(booking_id=9, user_id=1, movie_id=1).save()
+            self.assertEqual(next_booking_id(), 10)
+        self.assertEqual(next_booking_id(), 11)
+
+    def test_movie_list_shows_every_cinema(self):
+        self.client.force_login(User.objects.create_user('ann', 'ann@example.com', 'pw'))
+        response = self.client.get(reverse('movie_list'))
+        self.assertEqual([(m.title, m.venue) for m in response.context['movies']], [('Dune', 'main'), ('Arrival', 'north')])
+        self.assertContains(response, reverse('booking_add', args=[1]) + '?venue=north')
+        response = self.client.get(reverse('movie_list'), {'venue': 'north'})
+        self.assertEqual([m.title for m in response.context['movies']], ['Arrival'])
+
+    def test_booking_list_spans_venues(self):
+        user = User.objects.create_user('ann', 'ann@example.com', 'pw')
+        self.client.force_login(user)
+        Booking(booking_id=1, user_id=user.id, movie_id=1).save()
+        with venues.use_venue('north'):
+            Booking(booking_id=2, user_id=user.id, movie_id=1).save()
+        response = self.client.get(reverse('booking_list'))
+        self.assertEqual([(b.movie_title, b.venue) for b in response.context['bookings']],
+                         [('Dune', 'main'), ('Arrival', 'north')])
+        self.assertContains(response, reverse('booking_payment', args=[2]) + '?venue=north')
+
+    def test_request_venue_is_chosen_and_remembered(self):
+        url = reverse('api_v1_movie', args=[1])
+        self.assertEqual(json.loads(self.client.get(url).content)['title'], 'Dune')
+        response = self.client.get(url, {'venue': 'north'})
+        self.assertEqual(json.loads(response.content)['title'], 'Arrival')
+        self.assertEqual(response.cookies[venues.VENUE_COOKIE].value, 'north')
+        self.assertEqual(json.loads(self.client.get(url).content)['title'], 'Arrival')
+
+    def test_cookie_chosen_venue_varies_on_cookie(self):
+        url = reverse('api_v1_movie', args=[1])
+        self.assertIn('Cookie', self.client.get(url)['Vary'])
+        self.assertNotIn('Cookie', self.client.get(url, {'venue': 'north'}).get('Vary', ''))
+        self.assertIn('Cookie', self.client.get(url)['Vary'])
+
+    def test_booking_history_spans_venues(self):
+        user = User.objects.create_user('ann', 'ann@example.com', 'pw')
+        self.client.force_login(user)
+        ended = datetime(2025, 10, 3, 15, 0)
+        Booking(booking_id=1, user_id=user.id, movie_id=1, showtime='13:00', ends_at=ended).save()
+        with venues.use_venue('north'):
+            Booking(booking_id=2, user_id=user.id, movie_id=1, showtime='19:00', ends_at=ended).save()
+            Booking(booking_id=3, user_id=user.id, movie_id=1, showtime='19:00',
+                    ends_at=datetime(2025, 9, 3, 15, 0)).save()
+        for venue in venues.VENUES:
+            with venues.use_venue(venue):
+                archive_finished_bookings(now=datetime(2025, 11, 1, tzinfo=dt_timezone.utc))
+
+        response = self.client.get(reverse('booking_list'), {'history': ''})
+        self.assertEqual(response.context['history_months'], ['2025-10', '2025-09'])
+        self.assertEqual([(b['movie_title'], b['venue']) for b in response.context['history']],
+                         [('Arrival', 'north'), ('Dune', 'main')])
+        response = self.client.get(reverse('booking_list'), {'history': '2025-09'})
+        self.assertEqual([b['booking_id'] for b in response.context['history']], [3])
+
+    def test_rebalance_moves_documents_to_their_venue(self):
+        Movie(movie_id=2, title='Heat', type='Crime', venue='north').save()   # stored in the wrong database
+        Booking(booking_id=1, user_id=1, movie_id=2, venue='north').save()
+        Movie._get_collection().insert_one({'movie_id': 3, 'title': 'Legacy', 'type': 'Drama'})  # no venue
+        Booking(booking_id=2, user_id=1, movie_id=2, venue='south').save()   # not configured
+
+        self.assertEqual(rebalance(Movie, dry_run=True), {('main', 'north'): 1})
+        out, err = io.StringIO(), io.StringIO()
+        call_command('rebalance_venues', '--batch-size', '1', stdout=out, stderr=err)
+        self.assertIn('Moved 1 movies from main to north.', out.getvalue())
+        self.assertIn('1 bookings at main name an unknown venue', err.getvalue())
+
+        self.assertEqual(sorted(m.title for m in Movie.objects), ['Dune', 'Legacy'])
+        self.assertEqual(list(Booking.objects.distinct('booking_id')), [2])
+        with venues.use_venue('north'):
+            self.assertEqual(sorted(m.title for m in Movie.objects), ['Arrival', 'Heat'])
+            self.assertEqual(Booking.objects.get().booking_id, 1)
+        self.assertEqual(rebalance(Movie), {})
+
+    def test_rebalance_empties_aliases_no_venue_uses(self):
+        connect('movieflex_old', alias='old', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+        self.addCleanup(disconnect, 'old')
+        get_db('old')['movies'].insert_many([
+            {'movie_id': 4, 'title': 'Solaris', 'type': 'Sci-Fi', 'venue': 'north'},
+            {'movie_id': 5, 'title': 'Legacy', 'type': 'Drama'},
+        ])
+        with override_settings(MONGODB_ALIASES={'old': {'db': 'movieflex_old'}}):
+            self.assertEqual(rebalance(Movie), {('old', 'north'): 1, ('old', 'main'): 1})
+        self.assertEqual(get_db('old')['movies'].count_documents({}), 0)
+        self.assertEqual(sorted(m.title for m in Movie.objects), ['Dune', 'Legacy'])
+        with venues.use_venue('north'):
+            self.assertEqual(sorted(m.title for m in Movie.objects), ['Arrival', 'Solaris'])
+
+    def test_staff_queue_and_export_span_venues(self):
+        Booking(booking_id=1, user_id=1, movie_id=1, payment_status='Paid').save()
+        with venues.use_venue('north'):
+            Booking(booking_id=2, user_id=1, movie_id=1, payment_status='Paid').save()
+        self.client.force_login(User.objects.create_user('admin', 'a@example.com', 'pw', is_staff=True))
+
+        response = self.client.get(reverse('admin_booking_queue'))
+        self.assertEqual([(b.movie_title, b.venue) for b in response.context['bookings']],
+                         [('Dune', 'main'), ('Arrival', 'north')])
+        self.assertContains(response, reverse('admin_booking_reject', args=[2]) + '?venue=north')
+        self.client.get(reverse('admin_booking_reject', args=[2]), {'venue': 'north'})
+        with venues.use_venue('north'):
+            self.assertEqual(Booking.objects.get(booking_id=2).approval_status, 'Rejected')
+
+        response = self.client.get(reverse('admin_booking_export'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([(line.split(',')[3], line.split(',')[-1]) for line in lines[1:]],
+                         [('Dune', 'main'), ('Arrival', 'north')])
+
+
+# -----------------------------
+# Query budgets for every view
+# -----------------------------
+# (max MongoDB commands, max SQL queries) per request. Counts must also be the
+# same at 1x and 10x seed data, so a per-row query fails even under budget.
+QUERY_BUDGETS = {
+    'home': (1, 1),
+    'register': (0, 3),
+    'login': (0, 3),
+    'logout': (0, 1),
+    'movie_add': (4, 1),
+    'movie_list': (2, 1),
+    'movie_playing_soon': (1, 1),
+    'api_playing_soon': (1, 0),
+    'api_v1_movies': (1, 0),
+    'api_v1_movie': (1, 0),
+    'api_v1_availability': (1, 0),
+    'api_v1_screenings': (1, 0),
+    'movie_edit': (4, 1),
+    'movie_delete': (3, 1),
+    'booking_list': (3, 1),
+    'waiting_room': (4, 1),
+    'booking_add': (8, 1),
+    'booking_payment': (5, 1),
+    'payment_success': (2, 1),
+    'payment_cancel': (0, 1),
+    'ticket_download': (2, 1),
+    'api_scan_tickets': (2, 0),
+    'api_scanned_tickets': (1, 0),
+    'admin_booking_queue': (2, 1),
+    'admin_booking_export': (2, 1),
+    'admin_print_run': (2, 1),
+    'admin_booking_approve': (3, 2),  # booking, save, movie title for the email
+    'admin_booking_reject': (2, 1),
+}
+
+
+@override_settings(
+    SCANNER_API_KEY='door-key',
+    TICKET_SIGNING_KEY=TICKET_KEY,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    SESSION_ENGINE=CACHE_SESSIONS,
+)
+class QueryBudgetTests(TestCase):
+    SCALES = (1, 10)
+    ROWS = 5  # movies, bookings and users per unit of scale
+
+    def tearDown(self):
+        disconnect()
+        super().tearDown()
+
+    def seed(self, scale):
+        n = self.ROWS * scale
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', is_staff=True)
+        User.objects.bulk_create([User(username=f'user{i}', email=f'user{i}@example.com') for i in range(n)])
+
+        movies = [Movie(movie_id=i, title=f'Movie {i}', type=('Drama', 'Action')[i % 2], duration=100,
+                        showtimes=['13:00', '2099-01-01 19:00'], available_seats={'13:00': 30},
+                        booked_seats={'13:00': ['A1']}) for i in range(1, n + 1)]
+        Movie.objects.insert(movies, load_bulk=False)
+        sync_schedules(movies)
+
+        bookings = []
+        for i in range(1, 2 * n + 1):
+            mine = i % 2 == 1
+            bookings.append(Booking(
+                booking_id=i, user_id=self.admin.id if mine else self.admin.id + 1 + i % n,
+                movie_id=i % n + 1, showtime='2099-01-01 19:00', starts_at=datetime(2099, 1, 1, 19, 0),
+                seats_list=[f'B{i % 8 + 1}'], seats_booked=1,
+                payment_status='Paid', approval_status='Approved' if i % 3 else 'Pending',
+                ends_at=datetime(2020, 1 + i % 12, 1) if i % 4 == 0 else None,
+            ))
+        Booking.objects.insert(bookings, load_bulk=False)
+        archive_finished_bookings()
+        next_booking_id()  # a running site has already seeded the id counter
+        # booking 1 stays hot, belongs to admin, is paid and approved; booking 3 is the same but pending
+        self.tokens = [ticket_token(b) for b in bookings if b.approval_status == 'Approved']
+
+    def request(self, name):
+        """Issue the request for a route and consume any streamed body."""
+        c = self.client
+        if name == 'home':
+            return c.get(reverse('home'))
+        if name == 'register':
+            return c.post(reverse('register'), {'username': 'new', 'email': 'new@example.com',
+                                                'password': 'pw', 'confirm_password': 'pw'})
+        if name == 'login':
+            return c.post(reverse('login'), {'user': 'admin@example.com', 'password': 'pw'})
+        if name == 'logout':
+            return c.get(reverse('logout'))
+        if name == 'movie_add':
+            return c.post(reverse('movie_add'), {'title': 'New', 'type': 'Drama', 'duration': 90, 'showtimes': '13:00'})
+        if name == 'movie_list':
+            return c.get(reverse('movie_list'), {'q': 'Movie', 'genre': 'Drama'})
+        if name in ('movie_playing_soon', 'api_playing_soon'):
+            return c.get(reverse(name), {'hours': 48})
+        if name in ('api_v1_movies', 'api_v1_screenings'):
+            return c.get(reverse(name), {'after': 2 if name == 'api_v1_movies' else '', 'limit': 3})
+        if name in ('api_v1_movie', 'api_v1_availability'):
+            return c.get(reverse(name, args=[1]))
+        if name == 'movie_edit':
+            return c.post(reverse('movie_edit', args=[1]), {'title': 'Renamed', 'type': 'Drama', 'duration': 95,
+                                                            'showtimes': '13:00, 21:00'})
+        if name == 'movie_delete':
+            return c.post(reverse('movie_delete', args=[2]))
+        if name == 'booking_list':
+            return c.get(reverse('booking_list'), {'history': ''})
+        if name == 'waiting_room':
+            return c.get(reverse('waiting_room'), {'next': reverse('booking_add', args=[1])})
+        if name == 'booking_add':
+            return c.post(reverse('booking_add', args=[1]), {'screening': '2099-01-01T19:00', 'party_size': 2})
+        if name in ('booking_payment', 'payment_success', 'payment_cancel', 'ticket_download'):
+            return c.get(reverse(name, args=[1]))
+        if name in ('admin_booking_approve', 'admin_booking_reject'):
+            return c.get(reverse(name, args=[3]))
+        if name == 'api_scan_tickets':
+            body = {'movie_id': 2, 'starts_at': '2099-01-01T19:00', 'tokens': self.tokens}
+            return c.post(reverse(name), json.dumps(body), content_type='application/json',
+                          HTTP_X_SCANNER_KEY='door-key')
+        if name == 'api_scanned_tickets':
+            return c.get(reverse(name), {'movie_id': 2, 'starts_at': '2099-01-01T19:00'}, HTTP_X_SCANNER_KEY='door-key')
+        if name == 'admin_booking_queue':
+            return c.get(reverse(name))
+        if name in ('admin_booking_export', 'admin_print_run'):
+            params = {'movie_id': 2, 'starts_at': '2099-01-01T19:00'} if name == 'admin_print_run' else {}
+            with mock.patch('movieflex.printing.get_pool', return_value=ThreadPoolExecutor(2)):
+                response = c.get(reverse(name), params)
+                response.body = b''.join(response.streaming_content)
+            return response
+        raise AssertionError(f"No request defined for route {name!r}")
+
+    def measure(self, name, scale):
+        reset_mongo()
+        self.client.logout()
+        # each measurement seeds its own SQL rows and rolls them back afterwards
+        with transaction.atomic():
+            self.seed(scale)
+            self.client.force_login(self.admin)
+            with count_mongo_commands() as mongo, CaptureQueriesContext(connection) as sql:
+                response = self.request(name)
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f"{name} returned {response.status_code}")
+        return mongo, [q['sql'] for q in sql.captured_queries]
+
+    def test_every_route_has_a_budget(self):
+        routes = {p.name for p in get_resolver('movieflex.urls').url_patterns}
+        self.assertEqual(routes, set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        for name, (mongo_budget, sql_budget) in QUERY_BUDGETS.items():
+            with self.subTest(name):
+                counts = []
+                for scale in self.SCALES:
+                    mongo, sql = self.measure(name, scale)
+                    trace = (f"\n{name} @ {scale}x seed\nMongo ({len(mongo)}):\n  "
+                             + '\n  '.join(map(str, mongo))
+                             + f"\nSQL ({len(sql)}):\n  " + '\n  '.join(sql))
+                    self.assertLessEqual(len(mongo), mongo_budget, trace)
+                    self.assertLessEqual(len(sql), sql_budget, trace)
+                    counts.append((len(mongo), len(sql)))
+                self.assertEqual(counts[0], counts[-1], f"{name}: query count grows with data {counts}")
@@ -0,0 +1,31 @@
+# Ticket rendering kept free of Django/MongoEngine imports so it can run in
+# spawned worker processes.
+import io
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+TICKET_WIDTH = 400
+LINE_HEIGHT = 18
+MARGIN = 12
+
+
+def render_ticket_png(job):
+    """(booking_id, token, text_lines) -> (booking_id, PNG bytes) with the QR code above the details."""
+    booking_id, token, lines = job
+    qr = qrcode.make(token, box_size=6, border=2).get_image().convert('RGB')
+    qr = qr.resize((TICKET_WIDTH - 2 * MARGIN,) * 2)
+
+    height = qr.height + 2 * MARGIN + LINE_HEIGHT * len(lines)
+    ticket = Image.new('RGB', (TICKET_WIDTH, height), 'white')
+    ticket.paste(qr, (MARGIN, MARGIN))
+    draw = ImageDraw.Draw(ticket)
+    font = ImageFont.load_default()
+    y = qr.height + MARGIN
+    for line in lines:
+        draw.text((MARGIN, y), line, fill='black', font=font)
+        y += LINE_HEIGHT
+
+    out = io.BytesIO()
+    ticket.save(out, format='PNG', optimize=False)
+    return booking_id, out.getvalue()
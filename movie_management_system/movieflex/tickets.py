@@ -0,0 +1,148 @@
+import base64
+import struct
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import Booking
+from .schedule import parse_screening_key, screening_key
+
+TICKET_PREFIX = 'MF2'  # MF1 tokens did not name the screening
+SIGNATURE_BYTES = 12
+
+
+class InvalidTicket(ValueError):
+    pass
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signing_key():
+    """TICKET_SIGNING_KEY, which is shared with door scanners so it must not be SECRET_KEY."""
+    key = getattr(settings, 'TICKET_SIGNING_KEY', None)
+    if not key:
+        raise ImproperlyConfigured("Set TICKET_SIGNING_KEY to sign and verify tickets")
+    if key == settings.SECRET_KEY:
+        raise ImproperlyConfigured("TICKET_SIGNING_KEY must differ from SECRET_KEY")
+    return key
+
+
+def _sign(payload):
+    return salted_hmac('movieflex.ticket', payload, secret=_signing_key(), algorithm='sha256').digest()[:SIGNATURE_BYTES]
+
+
+# ---------------- Tokens ----------------
+def ticket_token(booking):
+    """Compact signed ticket, e.g. MF2.<payload>.<signature>, small enough for a dense QR code."""
+    payload = '|'.join([
+        str(booking.booking_id),
+        str(booking.movie_id),
+        booking.showtime or '',
+        screening_key(booking.starts_at) if booking.starts_at else '',
+        ' '.join(booking.seats_list or []),
+    ]).encode('utf-8')
+    return f"{TICKET_PREFIX}.{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def verify_ticket(token):
+    """Check a ticket's signature without touching the database; returns its fields."""
+    try:
+        prefix, payload_b64, signature_b64 = token.strip().split('.')
+        if prefix != TICKET_PREFIX:
+            raise InvalidTicket("Unknown ticket format")
+        payload = _b64decode(payload_b64)
+        signature = _b64decode(signature_b64)
+    except (AttributeError, ValueError) as e:
+        raise InvalidTicket("Malformed ticket") from e
+
+    if not constant_time_compare(signature, _sign(payload)):
+        raise InvalidTicket("Bad signature")
+
+    booking_id, movie_id, showtime, screening, seats = payload.decode('utf-8').split('|')
+    return {
+        'booking_id': int(booking_id),
+        'movie_id': int(movie_id),
+        'showtime': showtime,
+        'screening': screening,
+        'seats': seats.split() if seats else [],
+    }
+
+
+# ---------------- Door scanning ----------------
+def scan_tickets(tokens, movie_id, screening):
+    """Mark a batch of tickets scanned at one screening's door as used: one update_many plus one find.
+
+    `screening` is the screening's key (schedule.screening_key). Returns one
+    result per token: ok, already_used, not_approved, wrong_screening,
+    duplicate, unknown or invalid.
+    """
+    results = [None] * len(tokens)
+    positions = {}
+    for i, token in enumerate(tokens):
+        try:
+            ticket = verify_ticket(token)
+        except InvalidTicket as e:
+            results[i] = {'status': 'invalid', 'error': str(e)}
+            continue
+        booking_id = ticket['booking_id']
+        if (ticket['movie_id'], ticket['screening']) != (movie_id, screening):
+            results[i] = {'status': 'wrong_screening', 'booking_id': booking_id, 'screening': ticket['screening']}
+            continue
+        if booking_id in positions:
+            results[i] = {'status': 'duplicate', 'booking_id': booking_id}
+            continue
+        positions[booking_id] = i
+
+    if positions:
+        # Tag this batch's updates so we can tell our scans from earlier ones
+        batch = uuid.uuid4().hex
+        collection = Booking._get_collection()
+        collection.update_many(
+            {
+                'booking_id': {'$in': list(positions)},
+                'movie_id': movie_id,
+                'starts_at': parse_screening_key(screening),
+                'approval_status': 'Approved',
+                'scanned_at': None,
+            },
+            {'$set': {'scanned_at': timezone.now(), 'scan_batch': batch}},
+        )
+        found = collection.find(
+            {'booking_id': {'$in': list(positions)}},
+            {'_id': 0, 'booking_id': 1, 'approval_status': 1, 'scanned_at': 1, 'scan_batch': 1},
+        )
+        for doc in found:
+            if doc.get('scan_batch') == batch:
+                status = 'ok'
+            elif doc.get('scanned_at'):
+                status = 'already_used'
+            else:
+                status = 'not_approved'
+            results[positions.pop(doc['booking_id'])] = {'status': status, 'booking_id': doc['booking_id']}
+        for booking_id, i in positions.items():
+            results[i] = {'status': 'unknown', 'booking_id': booking_id}
+
+    return results
+
+
+def scanned_booking_ids(movie_id, starts_at, since=None):
+    """Sorted ids of bookings already scanned for one screening."""
+    filters = {'movie_id': movie_id, 'starts_at': starts_at, 'scanned_at': {'$ne': None}}
+    if since is not None:
+        filters['scanned_at'] = {'$gt': since}
+    cursor = Booking._get_collection().find(filters, {'_id': 0, 'booking_id': 1})
+    return sorted(doc['booking_id'] for doc in cursor)
+
+
+def pack_ids(ids):
+    """Big-endian uint32 array, for scanners to binary-search."""
+    return struct.pack(f'>{len(ids)}I', *ids)
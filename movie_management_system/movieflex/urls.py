@@ -14,19 +14,34 @@ urlpatterns = [
 
     # Movies
     path('movies/', views.movie_list, name='movie_list'),
+    path('movies/playing-soon/', views.movie_playing_soon, name='movie_playing_soon'),
+    path('api/playing-soon/', views.api_playing_soon, name='api_playing_soon'),
     path('movies/<int:movie_id>/edit/', views.movie_edit, name='movie_edit'),
     path('movies/<int:movie_id>/delete/', views.movie_delete, name='movie_delete'),
 
+    # Catalogue API (read-only, versioned)
+    path('api/v1/movies/', views.api_v1_movies, name='api_v1_movies'),
+    path('api/v1/movies/<int:movie_id>/', views.api_v1_movie, name='api_v1_movie'),
+    path('api/v1/movies/<int:movie_id>/availability/', views.api_v1_availability, name='api_v1_availability'),
+    path('api/v1/screenings/', views.api_v1_screenings, name='api_v1_screenings'),
+
     # Bookings
     path('bookings/', views.booking_list, name='booking_list'),
+    path('bookings/waiting-room/', views.waiting_room, name='waiting_room'),
     path('bookings/add/<str:movie_id>/', views.booking_add, name='booking_add'),
     path('bookings/payment/<int:booking_id>/', views.booking_payment, name='booking_payment'),
     path('bookings/payment/success/<int:booking_id>/', views.payment_success, name='payment_success'),
     path('bookings/payment/cancel/<int:booking_id>/', views.payment_cancel, name='payment_cancel'),
     path('bookings/ticket/<int:booking_id>/', views.ticket_download, name='ticket_download'),
 
+    # Door scanning
+    path('api/scan/', views.api_scan_tickets, name='api_scan_tickets'),
+    path('api/scan/scanned/', views.api_scanned_tickets, name='api_scanned_tickets'),
+
     # Admin approval
     path('admin/bookings/', views.admin_booking_queue, name='admin_booking_queue'),
+    path('admin/bookings/export/', views.admin_booking_export, name='admin_booking_export'),
+    path('admin/bookings/print-run/', views.admin_print_run, name='admin_print_run'),
     path('admin/bookings/approve/<int:booking_id>/', views.admin_booking_approve, name='admin_booking_approve'),
     path('admin/bookings/reject/<int:booking_id>/', views.admin_booking_reject, name='admin_booking_reject'),
 ]
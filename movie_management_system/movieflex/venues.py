@@ -0,0 +1,145 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.cache import patch_vary_headers
+from mongoengine.connection import DEFAULT_CONNECTION_NAME, get_db
+
+# Cinema -> MongoEngine connection alias holding its movies, screenings and bookings
+VENUES = getattr(settings, 'MOVIEFLEX_VENUES', None) or {'main': DEFAULT_CONNECTION_NAME}
+# Documents saved before venues existed have no venue and belong here
+DEFAULT_VENUE = getattr(settings, 'MOVIEFLEX_DEFAULT_VENUE', None) or next(iter(VENUES))
+VENUE_COOKIE = 'movieflex_venue'
+VENUE_FAN_OUT_WORKERS = getattr(settings, 'VENUE_FAN_OUT_WORKERS', None) or len(VENUES)
+
+if DEFAULT_VENUE not in VENUES:
+    raise ImproperlyConfigured(f"MOVIEFLEX_DEFAULT_VENUE {DEFAULT_VENUE!r} is not in MOVIEFLEX_VENUES")
+if len(set(VENUES.values())) != len(VENUES):
+    raise ImproperlyConfigured("Each venue in MOVIEFLEX_VENUES needs its own connection alias")
+
+_current = ContextVar('movieflex_venue', default=None)
+_collections = {}
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class UnknownVenue(ValueError):
+    pass
+
+
+# ---------------- Current venue ----------------
+def current_venue():
+    return _current.get() or DEFAULT_VENUE
+
+
+def alias_for(venue):
+    try:
+        return VENUES[venue]
+    except KeyError:
+        raise UnknownVenue(f"Unknown venue: {venue}")
+
+
+def is_multi_venue():
+    return len(VENUES) > 1
+
+
+def connected_aliases():
+    """Every alias settings connect: 'default', MONGODB_ALIASES and the venues' own."""
+    aliases = [DEFAULT_CONNECTION_NAME, *getattr(settings, 'MONGODB_ALIASES', {}), *VENUES.values()]
+    return list(dict.fromkeys(aliases))
+
+
+@contextmanager
+def use_venue(venue):
+    """Route VenueRouted documents to `venue`'s database inside the block (per thread/task)."""
+    alias_for(venue)
+    token = _current.set(venue)
+    try:
+        yield venue
+    finally:
+        _current.reset(token)
+
+
+class VenueRouted:
+    """Document mixin: collections come from the current venue's connection alias.
+
+    Use `use_venue()` rather than mongoengine's class-level switch_db, which
+    is not safe with several requests in flight.
+    """
+
+    @classmethod
+    def _get_db(cls):
+        return get_db(alias_for(current_venue()))
+
+    @classmethod
+    def _get_collection(cls):
+        db = cls._get_db()
+        key = (cls, alias_for(current_venue()))
+        collection = _collections.get(key)
+        # a reconnect (tests, forked workers) hands out a new Database object
+        if collection is None or collection.database is not db:
+            collection = _collections[key] = db[cls._get_collection_name()]
+            if cls._meta.get('auto_create_index', True) and db.client.is_primary:
+                cls.ensure_indexes()
+        return collection
+
+
+# ---------------- Cross-venue reads ----------------
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=VENUE_FAN_OUT_WORKERS, thread_name_prefix='venue')
+        return _pool
+
+
+def fan_out(fn, venues=None):
+    """Call fn() once per venue, in parallel, each inside use_venue(); returns {venue: result}.
+
+    fn must finish its reads before returning (e.g. list() a queryset).
+    """
+    venues = list(VENUES if venues is None else venues)
+
+    def run(venue):
+        with use_venue(venue):
+            return fn()
+
+    if len(venues) == 1:
+        return {venues[0]: run(venues[0])}
+    return dict(zip(venues, _get_pool().map(run, venues)))
+
+
+# ---------------- Middleware ----------------
+def _streamed_in_venue(venue, content):
+    with use_venue(venue):
+        yield from content
+
+
+class VenueMiddleware:
+    """Pick the request's venue from ?venue= (remembered in a cookie) or that cookie."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        chosen = request.GET.get('venue')
+        venue = chosen if chosen in VENUES else request.COOKIES.get(VENUE_COOKIE)
+        if venue not in VENUES:
+            venue = DEFAULT_VENUE
+        request.venue = venue
+
+        with use_venue(venue):
+            response = self.get_response(request)
+        if response.streaming:
+            # streamed bodies are produced after we return
+            response.streaming_content = _streamed_in_venue(venue, response.streaming_content)
+        if is_multi_venue():
+            if chosen in VENUES:
+                response.set_cookie(VENUE_COOKIE, venue, max_age=365 * 24 * 3600, samesite='Lax')
+            else:
+                # the same URL answers for another cinema once the cookie changes
+                patch_vary_headers(response, ('Cookie',))
+        return response
@@ -1,21 +1,48 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
-from django.contrib.auth import authenticate, login as django_login, logout as django_logout
+from django.contrib.auth import alogin, authenticate, logout as django_logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
-from .models import Movie, Booking  ppppppppppp# MongoDB models setup
+from .models import Movie, Booking, next_booking_id  # MongoDB models setup
 from .forms import BookingForm
+from .admission import (
+    admission_controlled, booking_gate, has_admission, issue_admission, WAITING_ROOM_REFRESH_SECONDS,
+)
+from .archive import archived_months, archived_bookings
+from .bulk import BOOKING_EXPORT_FIELDS, iter_booking_rows
+from .printing import print_run_jobs, render_tickets, stream_zip
+from .catalogue import (
+    BadQuery, MOVIE_FIELDS, SCREENING_FIELDS, api_response, movie_availability, movie_detail, movie_page,
+    page_size, parse_int, screening_page, select_fields,
+)
+from .tickets import ticket_token, scan_tickets, scanned_booking_ids, pack_ids
+from .passwords import HashingBusy, ahash_password, averify_password
+from .loaders import RequestLoader, get_loader, invalidate_movie
+from .seating import claim_seats, claim_best_block, release_seats
+from .venues import VENUES, current_venue, fan_out, is_multi_venue, use_venue
+from .schedule import (
+    invalid_showtimes, sync_schedule, clear_schedule, playing_soon,
+    screening_key, parse_screening_key, screenings_for,
+)
 import qrcode
 import stripe
 from django.conf import settings
 import os
 from django.core.mail import EmailMessage
 import io
+import csv
+from itertools import chain
 from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.crypto import constant_time_compare
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+import json
 
 from django.http import Http404
-from mongoengine.errors import DoesNotExist
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -35,7 +62,20 @@ def login_required_mongo(view_func):
 
 
 # ---------------- Registration section. ------------
-def register(request):
+async def _arender(request, template, status=200):
+    # Templates read request.user, whose lazy DB lookup can't run from async code
+    request.user = await request.auser()
+    return render(request, template, status=status)
+
+
+async def _auth_busy(request, template):
+    messages.error(request, "We're handling a lot of sign-ins right now. Please try again in a few seconds.")
+    response = await _arender(request, template, status=503)
+    response['Retry-After'] = '5'
+    return response
+
+
+async def register(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         email = request.POST.get('email')
@@ -50,39 +90,52 @@ def register(request):
             messages.error(request, "Passwords do not match.")
             return redirect('register')
 
-        if User.objects.filter(username=username).exists() or User.objects.filter(email=email).exists():
+        if await User.objects.filter(username=username).aexists() or await User.objects.filter(email=email).aexists():
             messages.error(request, "Username or email already exists.")
             return redirect('register')
 
-        User.objects.create_user(username=username, email=email, password=password)
+        user = User(username=User.normalize_username(username), email=User.objects.normalize_email(email))
+        try:
+            # PBKDF2 runs in the bounded hashing pool, not on the request thread
+            user.password = await ahash_password(password)
+        except HashingBusy:
+            return await _auth_busy(request, 'movieflex/register.html')
+        await user.asave()
         messages.success(request, "Registration successful! Please login.")
         return redirect('login')
 
-    return render(request, 'movieflex/register.html')
+    return await _arender(request, 'movieflex/register.html')
 
 # ---------------- Login section.----------------
-def user_login(request):
+async def user_login(request):
     if request.method == 'POST':
         user_input = request.POST.get('user')  # username or email
         password = request.POST.get('password')
 
         # Authenticate by username first, then email
-        user_obj = User.objects.filter(username=user_input).first() or User.objects.filter(email=user_input).first()
+        user_obj = (await User.objects.filter(username=user_input).afirst()
+                    or await User.objects.filter(email=user_input).afirst())
+
+        try:
+            # Also rehashes the password if the hasher settings have changed
+            valid = await averify_password(user_obj, password)
+        except HashingBusy:
+            return await _auth_busy(request, 'movieflex/login.html')
 
-        if user_obj and user_obj.check_password(password):
-            django_login(request, user_obj)
+        if valid:
+            await alogin(request, user_obj)
             # Store session info for MongoDB access
-            request.session['user_id'] = user_obj.id
-            request.session['username'] = user_obj.username
-            request.session['email'] = user_obj.email
-            request.session['role'] = 'admin' if user_obj.is_staff else 'user'
-            
+            await request.session.aset('user_id', user_obj.id)
+            await request.session.aset('username', user_obj.username)
+            await request.session.aset('email', user_obj.email)
+            await request.session.aset('role', 'admin' if user_obj.is_staff else 'user')
+
             # ✅ Redirect to movie list instead of home
             return redirect('movie_list')
         else:
             messages.error(request, "Invalid username/email or password.")
 
-    return render(request, 'movieflex/login.html')
+    return await _arender(request, 'movieflex/login.html')
 
 
 # ---------------- Add Movie (Admin Only.) ----------------
@@ -103,6 +156,11 @@ def movie_add(request):
         showtimes = [s.strip() for s in showtimes_str.split(',') if s.strip()]
         poster_url = request.POST.get('poster')  # field for image URL
 
+        bad = invalid_showtimes(showtimes)
+        if bad:
+            messages.error(request, f"Invalid showtimes: {', '.join(bad)}. Use HH:MM or YYYY-MM-DD HH:MM.")
+            return render(request, 'movieflex/movie_add.html')
+
         # ✅ handle optional file upload
         poster_file = request.FILES.get('poster_file')
         if poster_file:
@@ -123,7 +181,8 @@ def movie_add(request):
             poster_url = settings.MEDIA_URL + 'posters/' + filename
 
         # ✅ create an auto-increment movie_id
-        next_id = (Movie.objects.order_by('-movie_id').first().movie_id + 1) if Movie.objects.count() > 0 else 1
+        last = Movie.objects.order_by('-movie_id').only('movie_id').first()
+        next_id = (last.movie_id + 1) if last else 1
 
         # ✅ create and save the movie
         movie = Movie(
@@ -136,6 +195,7 @@ def movie_add(request):
             poster=poster_url,
         )
         movie.save()
+        sync_schedule(movie)
 
         messages.success(request, f"Movie '{title}' added successfully!")
         return redirect('movie_list')
@@ -151,9 +211,8 @@ def movie_edit(request, movie_id):
         messages.error(request, "Unauthorized access! Only admins can edit movies.")
         return redirect('movie_list')
 
-    try:
-        movie = Movie.objects.get(movie_id=int(movie_id))
-    except DoesNotExist:
+    movie = get_loader(request).movie(movie_id)
+    if not movie:
         raise Http404("Movie not found")
 
     if request.method == 'POST':
@@ -182,6 +241,10 @@ def movie_edit(request, movie_id):
             poster_url = settings.MEDIA_URL + 'posters/' + filename
 
         new_showtimes = [s.strip() for s in showtimes_str.split(',') if s.strip()]
+        bad = invalid_showtimes(new_showtimes)
+        if bad:
+            messages.error(request, f"Invalid showtimes: {', '.join(bad)}. Use HH:MM or YYYY-MM-DD HH:MM.")
+            return redirect('movie_edit', movie_id=movie.movie_id)
 
         movie.title = title
         movie.type = type_
@@ -194,6 +257,8 @@ def movie_edit(request, movie_id):
         movie.available_seats = {st: max(0, 30 - len(booked_map.get(st, []))) for st in new_showtimes}
 
         movie.save()
+        invalidate_movie(movie.movie_id)
+        sync_schedule(movie)
         messages.success(request, f"Movie '{title}' updated successfully!")
         return redirect('movie_list')
 
@@ -212,14 +277,15 @@ def movie_delete(request, movie_id):
         messages.error(request, "Unauthorized access! Only admins can delete movies.")
         return redirect('movie_list')
 
-    try:
-        movie = Movie.objects.get(movie_id=int(movie_id))
-    except DoesNotExist:
+    movie = get_loader(request).movie(movie_id)
+    if not movie:
         raise Http404("Movie not found")
 
     if request.method == 'POST':
         title = movie.title
         movie.delete()
+        invalidate_movie(movie.movie_id)
+        clear_schedule(movie.movie_id)
         messages.info(request, f"Movie '{title}' deleted.")
         return redirect('movie_list')
 
@@ -239,19 +305,29 @@ def movie_list(request):
     q = (request.GET.get('q') or '').strip()
     selected_genre = (request.GET.get('genre') or '').strip()
 
-    qs = Movie.objects
-    if q:
-        qs = qs(title__icontains=q)
-    if selected_genre and selected_genre.lower() != 'all':
-        qs = qs(type=selected_genre)
-
-    movies = qs.all()
-
-    # Distinct genre list for filter dropdown
-    try:
-        genres = sorted([g for g in (Movie.objects.distinct('type') or []) if g])
-    except Exception:
-        genres = []
+    selected_venue = request.GET.get('venue') if request.GET.get('venue') in VENUES else 'all'
+
+    def venue_listing():
+        qs = Movie.objects
+        if q:
+            qs = qs(title__icontains=q)
+        if selected_genre and selected_genre.lower() != 'all':
+            qs = qs(type=selected_genre)
+        # Evaluate here: the template re-reading a lazy queryset would re-query and drop the normalization below
+        movies = list(qs)
+        for movie in movies:
+            movie.venue = movie.venue or current_venue()
+        # Distinct genre list for filter dropdown
+        try:
+            genres = Movie.objects.distinct('type') or []
+        except Exception:
+            genres = []
+        return movies, genres
+
+    # Every cinema is queried at once, each on its own database
+    listings = fan_out(venue_listing, VENUES if selected_venue == 'all' else [selected_venue])
+    movies = [movie for found, _ in listings.values() for movie in found]
+    genres = sorted({g for _, found in listings.values() for g in found if g})
     for movie in movies:
         # Normalize available_seats to a dict for safe template rendering
         showtimes = list(getattr(movie, 'showtimes', []) or [])
@@ -280,68 +356,259 @@ def movie_list(request):
         'genres': genres,
         'q': q,
         'selected_genre': selected_genre or 'all',
+        'venues': list(VENUES) if is_multi_venue() else [],
+        'selected_venue': selected_venue,
+    })
+
+# ---------------- Playing Soon ----------------
+def _playing_soon_hours(request):
+    try:
+        return int(request.GET.get('hours') or 6)
+    except ValueError:
+        return 6
+
+
+@login_required_mongo
+def movie_playing_soon(request):
+    hours = _playing_soon_hours(request)
+    screenings = list(playing_soon(hours))
+    for screening in screenings:
+        screening.key = screening_key(screening.starts_at)  # what booking_add's form selects
+    return render(request, 'movieflex/playing_soon.html', {
+        'screenings': screenings,
+        'hours': hours,
+        'hour_choices': [3, 6, 12, 24, 48],
     })
 
+
+def api_playing_soon(request):
+    hours = _playing_soon_hours(request)
+    rows = playing_soon(hours).only(
+        'movie_id', 'movie_title', 'showtime', 'starts_at', 'ends_at'
+    ).as_pymongo()
+    return JsonResponse({
+        'hours': hours,
+        'screenings': [
+            {
+                'movie_id': r['movie_id'],
+                'title': r.get('movie_title'),
+                'showtime': r['showtime'],
+                'starts_at': r['starts_at'].isoformat() + 'Z',
+                'ends_at': r['ends_at'].isoformat() + 'Z',
+            }
+            for r in rows
+        ],
+    })
+
+# ---------------- Catalogue API (v1, read-only) ----------------
+def _api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _next_page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['after'] = cursor
+    return f"{request.path}?{params.urlencode()}"
+
+
+@require_GET
+def api_v1_movies(request):
+    try:
+        fields = select_fields(request.GET.get('fields'), MOVIE_FIELDS, required=('movie_id',))
+        rows, cursor = movie_page(
+            fields,
+            after=parse_int(request.GET.get('after'), 'after'),
+            limit=page_size(request.GET.get('limit')),
+            genre=(request.GET.get('genre') or '').strip(),
+        )
+    except BadQuery as e:
+        return _api_error(str(e))
+    return api_response(request, {'results': rows, 'next': _next_page_url(request, cursor)})
+
+
+@require_GET
+def api_v1_movie(request, movie_id):
+    try:
+        fields = select_fields(request.GET.get('fields'), MOVIE_FIELDS, required=('movie_id',))
+    except BadQuery as e:
+        return _api_error(str(e))
+    movie = movie_detail(movie_id, fields)
+    if movie is None:
+        return _api_error("Movie not found", status=404)
+    return api_response(request, movie)
+
+
+@require_GET
+def api_v1_availability(request, movie_id):
+    availability = movie_availability(movie_id)
+    if availability is None:
+        return _api_error("Movie not found", status=404)
+    # Seat counts move with every booking: always revalidate
+    return api_response(request, availability, max_age=0)
+
+
+@require_GET
+def api_v1_screenings(request):
+    try:
+        fields = select_fields(request.GET.get('fields'), SCREENING_FIELDS, required=('starts_at',))
+        rows, cursor = screening_page(
+            fields,
+            after=request.GET.get('after'),
+            limit=page_size(request.GET.get('limit')),
+            movie_id=parse_int(request.GET.get('movie_id'), 'movie_id'),
+        )
+    except BadQuery as e:
+        return _api_error(str(e))
+    return api_response(request, {'results': rows, 'next': _next_page_url(request, cursor)})
+
+
 # ---------------- Booking List ----------------
+def _status_label(payment_status):
+    return 'Pending' if payment_status == 'Pending' else ('Confirmed' if payment_status == 'Paid' else payment_status)
+
+
 @login_required_mongo
 def booking_list(request):
-    bookings = list(Booking.objects(user_id=request.user.id))
-    # Map movie_id -> title
-    movie_ids = [b.movie_id for b in bookings]
-    movies = {m.movie_id: m for m in Movie.objects(movie_id__in=movie_ids)} if movie_ids else {}
-    # Attach transient fields for template
-    for b in bookings:
-        m = movies.get(b.movie_id)
-        b.movie_title = m.title if m else f"Movie #{b.movie_id}"
-        b.status_label = 'Pending' if b.payment_status == 'Pending' else ('Confirmed' if b.payment_status == 'Paid' else b.payment_status)
-    return render(request, 'movieflex/booking_list.html', {'bookings': bookings})
+    loader = get_loader(request)
+    home_venue = current_venue()
+
+    def venue_loader():
+        # RequestLoader caches per venue, so other cinemas get their own
+        return loader if current_venue() == home_venue else RequestLoader()
+
+    def venue_bookings():
+        titles = venue_loader()
+        found = list(Booking.objects(user_id=request.user.id))
+        # One batched metadata lookup for all titles
+        titles.movie_meta_many(b.movie_id for b in found)
+        # Attach transient fields for template
+        for b in found:
+            b.venue = b.venue or current_venue()
+            b.movie_title = titles.movie_title(b.movie_id)
+            b.status_label = _status_label(b.payment_status)
+        return found
+
+    def venue_history(month):
+        titles = venue_loader()
+        found = archived_bookings(request.user.id, month)
+        titles.movie_meta_many(b['movie_id'] for b in found)
+        for b in found:
+            b['venue'] = b.get('venue') or current_venue()
+            b['movie_title'] = titles.movie_title(b['movie_id'])
+            b['status_label'] = _status_label(b.get('payment_status'))
+        return found
+
+    # A user's bookings may be spread over several cinemas
+    bookings = [b for found in fan_out(venue_bookings).values() for b in found]
+
+    # Past bookings live in each venue's archive and are only read when asked for
+    context = {'bookings': bookings, 'multi_venue': is_multi_venue()}
+    if 'history' in request.GET:
+        by_venue = fan_out(lambda: archived_months(request.user.id))
+        months = sorted({m for found in by_venue.values() for m in found}, reverse=True)
+        month = request.GET.get('history') or (months[0] if months else '')
+        history = []
+        if month in months:
+            venues_with_month = [venue for venue, found in by_venue.items() if month in found]
+            history = [b for found in fan_out(lambda: venue_history(month), venues_with_month).values() for b in found]
+            history.sort(key=lambda b: b['booking_id'], reverse=True)
+        context.update({'show_history': True, 'history_months': months, 'history_month': month, 'history': history})
+    return render(request, 'movieflex/booking_list.html', context)
+
+# ---------------- Waiting Room ----------------
+@login_required_mongo
+def waiting_room(request):
+    next_url = request.GET.get('next') or ''
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('movie_list')
+    if has_admission(request):
+        return redirect(next_url)
+
+    ticket = request.session.get('admission_ticket')
+    if not ticket:
+        ticket = booking_gate.take_ticket()
+        request.session['admission_ticket'] = ticket
+
+    serving = booking_gate.advance()
+    if ticket <= serving:
+        del request.session['admission_ticket']
+        return issue_admission(request, redirect(next_url), ticket)
+
+    return render(request, 'movieflex/waiting_room.html', {
+        'position': ticket - serving - 1,  # people ahead
+        'next': next_url,
+        'refresh': WAITING_ROOM_REFRESH_SECONDS,
+    })
 
 # ---------------- Add Booking ----------------
 @login_required_mongo
+@admission_controlled
 
 def booking_add(request, movie_id):
     # Fetch movie safely using MongoEngine
     try:
-        movie = Movie.objects.get(movie_id=int(movie_id))
-    except DoesNotExist:
+        movie = get_loader(request).movie(movie_id)
+    except ValueError:
+        movie = None
+    if not movie:
         raise Http404("Movie not found")
 
-    # Prepare showtime choices for the form
-    showtime_choices = [(s, s) for s in getattr(movie, 'showtimes', [])]
+    # The form offers concrete upcoming screenings; seats are booked per screening
+    screenings = {screening_key(sc.starts_at): sc for sc in screenings_for(movie)}
+    screening_choices = [
+        (key, f"{timezone.localtime(sc.starts_at):%a %d %b, %H:%M}") for key, sc in screenings.items()
+    ]
 
     if request.method == 'POST':
         form = BookingForm(request.POST)
-        form.fields['showtime'].choices = showtime_choices
+        form.fields['screening'].choices = screening_choices
 
         if form.is_valid():
-            showtime = form.cleaned_data['showtime']
+            key = form.cleaned_data['screening']
+            screening = screenings[key]
             seats_requested = form.cleaned_data['seats']  # already a cleaned list
-
-            # Handle booked seats map
-            booked = movie.booked_seats.get(showtime, [])
-            overlap = set(seats_requested) & set(booked)
-            if overlap:
-                form.add_error('seats', f"Seats already booked: {', '.join(overlap)}")
+            party_size = form.cleaned_data.get('party_size')
+
+            # Claim seats atomically so two users can never get the same seat
+            if seats_requested:
+                claimed = seats_requested if claim_seats(movie.movie_id, key, seats_requested) else None
+                if not claimed:
+                    booked = (Movie.objects(movie_id=movie.movie_id).only('booked_seats').first().booked_seats or {}).get(key, [])
+                    overlap = sorted(set(seats_requested) & set(booked))
+                    form.add_error('seats', f"Seats already booked: {', '.join(overlap)}")
             else:
-                # Create Booking document
-                booking = Booking(
-                    booking_id=Booking.objects.count() + 1,
-                    user_id=request.user.id,
-                    movie_id=movie.movie_id,
-                    seats_list=seats_requested,
-                    seats_booked=len(seats_requested),
-                    showtime=showtime,
-                    payment_status='Pending'
-                )
-                booking.save()
-
-                # Update movie booked seats
-                movie.booked_seats.setdefault(showtime, []).extend(seats_requested)
-                movie.save()
+                claimed = claim_best_block(movie.movie_id, key, party_size)
+                if not claimed:
+                    form.add_error('party_size', f"No block of {party_size} seats together is left for this screening.")
+
+            if claimed:
+                try:
+                    # Create Booking document
+                    booking = Booking(
+                        booking_id=next_booking_id(),
+                        user_id=request.user.id,
+                        movie_id=movie.movie_id,
+                        seats_list=claimed,
+                        seats_booked=len(claimed),
+                        showtime=screening.showtime,
+                        starts_at=screening.starts_at,
+                        ends_at=screening.ends_at,
+                        payment_status='Pending'
+                    )
+                    booking.save()
+                except Exception:
+                    # don't leave seats held by a booking that doesn't exist
+                    release_seats(movie.movie_id, key, claimed)
+                    raise
+                if not seats_requested:
+                    messages.success(request, f"Seats {', '.join(claimed)} reserved for you.")
                 return redirect('booking_list')
     else:
-        form = BookingForm()
-        form.fields['showtime'].choices = showtime_choices
+        chosen = request.GET.get('screening')
+        form = BookingForm(initial={'screening': chosen if chosen in screenings else next(iter(screenings), None)})
+        form.fields['screening'].choices = screening_choices
 
     return render(request, 'movieflex/booking_form.html', {
         'form': form,
@@ -352,15 +619,17 @@ def booking_add(request, movie_id):
 
 # ---------------- Payment ----------------
 @login_required_mongo
+@admission_controlled
 def booking_payment(request, booking_id):
-    booking = Booking.objects(booking_id=booking_id, user_id=request.user.id).first()
+    loader = get_loader(request)
+    booking = loader.booking(booking_id, user_id=request.user.id)
     if not booking:
         raise Http404("Booking not found")
+    movie = loader.movie_meta(booking.movie_id)
 
     if request.method == "POST":
         # Create a Stripe Checkout Session
         try:
-            movie = Movie.objects(movie_id=booking.movie_id).first()
             unit_amount = 1000  # $10.00 per seat in cents
             success_url = request.build_absolute_uri(
                 reverse('payment_success', kwargs={'booking_id': booking.booking_id})
@@ -375,7 +644,7 @@ def booking_payment(request, booking_id):
                     'price_data': {
                         'currency': 'usd',
                         'product_data': {
-                            'name': f"{movie.title if movie else 'Movie'} ({booking.showtime})",
+                            'name': f"{movie['title'] if movie else 'Movie'} ({booking.showtime})",
                         },
                         'unit_amount': unit_amount,
                     },
@@ -391,7 +660,6 @@ def booking_payment(request, booking_id):
             return redirect('booking_payment', booking_id=booking.booking_id)
 
     # GET: show summary with correct totals
-    movie = Movie.objects(movie_id=booking.movie_id).first()
     total_amount_dollars = booking.seats_booked * 10  # $10 per seat
     return render(request, 'movieflex/payment.html', {
         'booking': booking,
@@ -403,7 +671,7 @@ def booking_payment(request, booking_id):
 # ---------------- Stripe Checkout Success/Cancel ----------------
 @login_required_mongo
 def payment_success(request, booking_id):
-    booking = Booking.objects(booking_id=booking_id, user_id=request.user.id).first()
+    booking = get_loader(request).booking(booking_id, user_id=request.user.id)
     if not booking:
         raise Http404("Booking not found")
     # In production, verify session/payment via webhook or retrieve Session
@@ -425,29 +693,93 @@ def payment_cancel(request, booking_id):
 def admin_booking_queue(request):
     if not request.user.is_staff:
         raise Http404()
-    pending = Booking.objects(payment_status='Paid', approval_status='Pending')
-    # Attach movie titles
-    ids = [b.movie_id for b in pending]
-    movies = {m.movie_id: m for m in Movie.objects(movie_id__in=ids)} if ids else {}
-    for b in pending:
-        m = movies.get(b.movie_id)
-        b.movie_title = m.title if m else f"Movie #{b.movie_id}"
-    return render(request, 'movieflex/admin_booking_list.html', {'bookings': pending})
+    loader = get_loader(request)
+    home_venue = current_venue()
+
+    def venue_pending():
+        titles = loader if current_venue() == home_venue else RequestLoader()
+        found = list(Booking.objects(payment_status='Paid', approval_status='Pending'))
+        # Attach movie titles
+        titles.movie_meta_many(b.movie_id for b in found)
+        for b in found:
+            b.venue = b.venue or current_venue()
+            b.movie_title = titles.movie_title(b.movie_id)
+        return found
+
+    # Staff approve for every cinema from one queue
+    pending = [b for found in fan_out(venue_pending).values() for b in found]
+    return render(request, 'movieflex/admin_booking_list.html', {
+        'bookings': pending,
+        'multi_venue': is_multi_venue(),
+        'venues': list(VENUES),
+        'home_venue': home_venue,
+    })
+
+
+class _Echo:
+    # csv.writer target that hands each row straight back instead of buffering it
+    def write(self, value):
+        return value
+
+
+@login_required_mongo
+def admin_booking_export(request):
+    if not request.user.is_staff:
+        raise Http404()
+    filters = {}
+    for field in ('payment_status', 'approval_status'):
+        value = request.GET.get(field)
+        if value:
+            filters[field] = value
+
+    include_archived = 'include_archived' in request.GET
+
+    def venue_rows():
+        # every cinema, one after the other; live bookings only unless ?include_archived
+        for venue in VENUES:
+            with use_venue(venue):
+                yield from iter_booking_rows(filters, include_archived=include_archived)
+
+    writer = csv.writer(_Echo())
+    rows = chain([BOOKING_EXPORT_FIELDS], venue_rows())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="bookings.csv"'
+    return response
+
+
+@login_required_mongo
+def admin_print_run(request):
+    if not request.user.is_staff:
+        raise Http404()
+    try:
+        movie_id = int(request.GET.get('movie_id', ''))
+    except ValueError:
+        raise Http404("Movie not found")
+    starts_at = parse_screening_key(request.GET.get('starts_at'))
+    movie = get_loader(request).movie_meta(movie_id)
+    if not movie or starts_at is None:
+        raise Http404("Screening not found")
+
+    rendered = render_tickets(print_run_jobs(movie_id, starts_at, movie_title=movie['title']))
+    response = StreamingHttpResponse(stream_zip(rendered), content_type='application/zip')
+    filename = f"tickets_{movie_id}_{screening_key(starts_at)}.zip".replace(':', '')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 @login_required_mongo
 def admin_booking_approve(request, booking_id):
     if not request.user.is_staff:
         raise Http404()
-    booking = Booking.objects(booking_id=booking_id).first()
+    loader = get_loader(request)
+    booking = loader.booking(booking_id)
     if not booking:
         raise Http404("Booking not found")
     booking.approval_status = 'Approved'
     booking.save()
     # Send ticket email now
-    movie = Movie.objects(movie_id=booking.movie_id).first()
-    qr_data = f"BookingID:{booking.booking_id}, Movie:{movie.title if movie else ''}, Showtime:{booking.showtime}, Seats:{', '.join(booking.seats_list)}"
-    qr_img = qrcode.make(qr_data)
+    movie = loader.movie_meta(booking.movie_id)
+    qr_img = qrcode.make(ticket_token(booking))
     buffer = io.BytesIO()
     qr_img.save(buffer, format='PNG')
     buffer.seek(0)
@@ -459,7 +791,7 @@ def admin_booking_approve(request, booking_id):
             f"Hello {recipient_user.username if recipient_user else ''},\n\n"
             f"Your booking has been approved. Details:\n"
             f"Booking ID: {booking.booking_id}\n"
-            f"Movie: {movie.title if movie else ''}\n"
+            f"Movie: {movie['title'] if movie else ''}\n"
             f"Showtime: {booking.showtime}\n"
             f"Seats: {', '.join(booking.seats_list)}\n\n"
             f"Your QR ticket is attached.\n"
@@ -475,7 +807,7 @@ def admin_booking_approve(request, booking_id):
 def admin_booking_reject(request, booking_id):
     if not request.user.is_staff:
         raise Http404()
-    booking = Booking.objects(booking_id=booking_id).first()
+    booking = get_loader(request).booking(booking_id)
     if not booking:
         raise Http404("Booking not found")
     booking.approval_status = 'Rejected'
@@ -486,16 +818,85 @@ def admin_booking_reject(request, booking_id):
 # ---------------- QR Code Ticket ----------------
 @login_required_mongo
 def ticket_download(request, booking_id):
-    booking = Booking.objects(booking_id=booking_id, user_id=request.user.id).first()
+    loader = get_loader(request)
+    booking = loader.booking(booking_id, user_id=request.user.id)
     if not booking:
         raise Http404("Booking not found")
-    movie = Movie.objects(movie_id=booking.movie_id).first()
+    movie = loader.movie_meta(booking.movie_id)
     if not movie:
         raise Http404("Movie not found")
 
-    qr_data = f"BookingID:{booking.booking_id}, Movie:{movie.title}, Showtime:{booking.showtime}, Seats:{', '.join(booking.seats_list)}"
-    qr = qrcode.make(qr_data)
+    qr = qrcode.make(ticket_token(booking))
 
     response = HttpResponse(content_type="image/png")
     qr.save(response, "PNG")
     return response
+
+
+# ---------------- Door Scanning API ----------------
+MAX_SCAN_BATCH = 500
+
+
+def scanner_key_required(view_func):
+    # Scanner devices authenticate with the shared SCANNER_API_KEY header
+    def wrapper(request, *args, **kwargs):
+        expected = getattr(settings, 'SCANNER_API_KEY', '')
+        supplied = request.headers.get('X-Scanner-Key', '')
+        if not expected or not constant_time_compare(supplied, expected):
+            return JsonResponse({'error': 'Invalid scanner key'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+@csrf_exempt
+@require_POST
+@scanner_key_required
+def api_scan_tickets(request):
+    try:
+        body = json.loads(request.body or b'{}')
+        tokens = body.get('tokens')
+        movie_id, screening = body.get('movie_id'), body.get('starts_at')
+    except (ValueError, AttributeError):
+        tokens = movie_id = screening = None
+    if not isinstance(tokens, list) or not all(isinstance(t, str) for t in tokens):
+        return JsonResponse({'error': 'Expected {"movie_id": 1, "starts_at": "2099-01-01T13:00", "tokens": ["MF2...", ...]}'}, status=400)
+    if not isinstance(movie_id, int) or not isinstance(screening, str) or parse_screening_key(screening) is None:
+        return JsonResponse({'error': 'movie_id and starts_at (the screening being admitted) are required'}, status=400)
+    if len(tokens) > MAX_SCAN_BATCH:
+        return JsonResponse({'error': f'At most {MAX_SCAN_BATCH} tokens per batch'}, status=400)
+    return JsonResponse({'results': scan_tickets(tokens, movie_id, screening_key(parse_screening_key(screening)))})
+
+
+@require_GET
+@scanner_key_required
+def api_scanned_tickets(request):
+    try:
+        movie_id = int(request.GET['movie_id'])
+    except (KeyError, ValueError):
+        movie_id = None
+    starts_at = parse_screening_key(request.GET.get('starts_at'))
+    if movie_id is None or starts_at is None:
+        return JsonResponse({'error': 'movie_id and starts_at are required'}, status=400)
+    since = None
+    if request.GET.get('since'):
+        try:
+            since = parse_datetime(request.GET['since'])
+        except ValueError:
+            pass
+        if since is None:
+            # a '+' in the offset must be sent as %2B or it arrives as a space
+            return JsonResponse({'error': 'since must be an ISO 8601 datetime'}, status=400)
+
+    as_of = timezone.now()
+    ids = scanned_booking_ids(movie_id, starts_at, since=since)
+    if request.GET.get('format') == 'bin':
+        response = HttpResponse(pack_ids(ids), content_type='application/octet-stream')
+        response['X-Scanned-As-Of'] = as_of.isoformat()
+        return response
+    return JsonResponse({
+        'movie_id': movie_id,
+        'starts_at': screening_key(starts_at),
+        'as_of': as_of.isoformat(),
+        'count': len(ids),
+        'booking_ids': ids,
+    })